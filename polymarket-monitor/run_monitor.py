@@ -1,9 +1,11 @@
 import asyncio
-from src.polymarket_monitor.monitor import Monitor
+from src.polymarket_monitor.workers import get_monitor
+from src.polymarket_monitor.logs import setup_logging
 
 async def main():
-    m = Monitor()
+    m = get_monitor()
     await m.run()
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(main())
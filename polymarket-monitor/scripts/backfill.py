@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from src.polymarket_monitor.adapter import _build_source
+from src.polymarket_monitor.backfill import Backfill
+from src.polymarket_monitor.config import settings
+from src.polymarket_monitor.logs import setup_logging
+from src.polymarket_monitor.store import get_store
+
+
+def parse_time(value):
+    """Unix seconds, an ISO date/datetime (UTC), or a relative age such as 7d / 12h."""
+    if value[-1:] in ('d', 'h') and value[:-1].isdigit():
+        unit = 86400 if value[-1] == 'd' else 3600
+        return int(time.time()) - int(value[:-1]) * unit
+    if value.isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Seed the trade store with historical trades')
+    parser.add_argument('--source', default='thegraph',
+                        help='comma-separated source types to page (thegraph, graphql)')
+    parser.add_argument('--since', default='2d', help='range start (default: 2d ago)')
+    parser.add_argument('--until', default=None, help='range end (default: now)')
+    parser.add_argument('--concurrency', type=int, default=settings.BACKFILL_CONCURRENCY)
+    parser.add_argument('--slice-hours', type=float, default=settings.BACKFILL_SLICE_SECONDS / 3600)
+    args = parser.parse_args()
+
+    start = parse_time(args.since)
+    end = parse_time(args.until) if args.until else int(time.time())
+    store = get_store()
+    try:
+        for source in [s.strip().lower() for s in args.source.split(',') if s.strip()]:
+            adapter = _build_source(source)
+            if adapter is None:
+                continue
+            try:
+                await Backfill(store, adapter, source, start, end,
+                               slice_seconds=int(args.slice_hours * 3600),
+                               concurrency=args.concurrency).run()
+            finally:
+                await adapter.close()
+    finally:
+        await store.close()
+
+if __name__ == '__main__':
+    setup_logging()
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""Check that AnomalyScorer's size baseline does not depend on batch size.
+
+    PYTHONPATH=$(pwd) python3 scripts/check_anomaly.py
+
+Feeds the same synthetic lognormal trade sizes (one market, true log-size
+std SIGMA) to fresh scorers in batches of 1, 20 and 200 trades. Every run
+should estimate roughly the true std and fire size_anomaly on roughly the
+same (small) share of trades, whatever the batch size. Needs numpy only.
+"""
+import numpy as np
+from src.polymarket_monitor.config import settings
+from src.polymarket_monitor.signals import AnomalyScorer
+from src.polymarket_monitor.trade import Trade
+
+SIGMA = 0.91
+TRADES = 6000
+
+
+def run(sizes, batch):
+    scorer = AnomalyScorer()
+    fired = 0
+    for start in range(0, len(sizes), batch):
+        trades = [Trade(f'0x{i}', f'0xw{i}', 'm1', 'Check market', int(sizes[i] * 1e6), 1_700_000_000 + i)
+                  for i in range(start, min(start + batch, len(sizes)))]
+        fired += sum(1 for f in scorer.score(trades) if f[0] == 'size_anomaly')
+    row = scorer.markets.rows['m1']
+    return float(np.sqrt(scorer.markets.cols['var'][row])), fired
+
+
+def main():
+    # Keep the other detectors out of the count
+    settings.ANOMALY_CONCENTRATION_MIN_USDC = float('inf')
+    settings.ANOMALY_BURST_MIN_TRADES = TRADES + 1
+    rng = np.random.default_rng(7)
+    sizes = np.exp(rng.normal(np.log(500), SIGMA, TRADES))
+    results = {batch: run(sizes, batch) for batch in (1, 20, 200)}
+    for batch, (std, fired) in results.items():
+        print(f'batch={batch:>3}: estimated std {std:.3f} (true {SIGMA}), size_anomaly on {fired}/{TRADES}')
+    for batch, (std, fired) in results.items():
+        assert abs(std - SIGMA) < 0.25 * SIGMA, f'batch={batch}: std {std:.3f} far from {SIGMA}'
+        assert fired <= 0.01 * TRADES, f'batch={batch}: {fired} size anomalies on in-distribution trades'
+    print('OK')
+
+if __name__ == '__main__':
+    main()
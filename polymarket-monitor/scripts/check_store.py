@@ -0,0 +1,70 @@
+"""Exercise the configured store backend end to end.
+
+Against a throwaway local Postgres, for example:
+    docker run --rm -d -p 5432:5432 -e POSTGRES_PASSWORD=pg postgres:16
+    STORE_BACKEND=postgres DATABASE_URL=postgresql://postgres:pg@localhost/postgres \
+        PYTHONPATH=$(pwd) python3 scripts/check_store.py
+With the default backend it runs against a temporary SQLite file.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from src.polymarket_monitor.config import settings
+from src.polymarket_monitor.store import get_store
+
+
+async def main():
+    if (settings.STORE_BACKEND or 'sqlite').lower() == 'sqlite':
+        settings.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'check.db')
+    store = get_store()
+    print('Store backend:', store.__class__.__name__)
+    now = int(time.time())
+    tag = f'check-{now}'
+    try:
+        await store.init()
+        await store.add_trades([
+            (f'{tag}-1', f'{tag}-w', 'm1', 'Market', 10.5, now - 60),
+            (f'{tag}-2', f'{tag}-w', 'm1', 'Market', 2.0, now - 30),
+            (f'{tag}-1', f'{tag}-w', 'm1', 'Market', 10.5, now - 60),  # duplicate tx
+        ])
+        await store.set_cursor(tag, now - 30, 'x')
+        assert await store.get_cursor(tag) == (now - 30, 'x')
+        await store.flush()
+        assert await store.count_wallet_market_recent(f'{tag}-w', 'm1') == 2, 'dedup on tx_hash'
+        assert await store.wallet_has_prior_polymarket_trades(f'{tag}-w')
+        assert f'{tag}-w' in await store.known_wallets()
+        assert len([r for r in await store.recent_trades(now - 120) if r[1] == f'{tag}-w']) == 2
+
+        await store.set_discovery(tag, {'query': 'q'}, now)
+        assert (await store.get_discovery(tag))[0] == {'query': 'q'}
+        await store.clear_discovery(tag)
+        assert await store.get_discovery(tag) is None
+
+        await store.set_markets([(f'{tag}-m', 'Will it check?', ('Tests',), now), (f'{tag}-x', None, (), now)])
+        markets = await store.get_markets([f'{tag}-m', f'{tag}-x', f'{tag}-missing'])
+        assert markets == {f'{tag}-m': ('Will it check?', ('Tests',), now), f'{tag}-x': (None, (), now)}
+
+        await store.set_wallet_first_tx(f'{tag}-w', None, now)
+        assert await store.get_wallet_first_tx(f'{tag}-w') == (None, now)
+
+        alert_id = await store.add_alert(f'{tag}-w', 10.5, 'Market', 'check', now)
+        await store.bump_alert_attempts([alert_id])
+        assert any(r[0] == alert_id for r in await store.pending_alerts())
+        await store.delete_alerts([alert_id])
+        assert not any(r[0] == alert_id for r in await store.pending_alerts())
+
+        await store.set_alert_state('check', f'{tag}-w', 'm1', now)
+        assert ('check', f'{tag}-w', 'm1', now) in [tuple(r) for r in await store.alert_states(now)]
+
+        purged = await store.purge_trades(now - 45)
+        assert purged >= 1 and await store.count_wallet_market_recent(f'{tag}-w', 'm1') == 1
+        assert await store.wallet_has_prior_polymarket_trades(f'{tag}-w'), 'wallet history outlives retention'
+        await store.compact()
+        print('Database size (bytes, free):', await store.database_size())
+        print('OK')
+    finally:
+        await store.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""Exercise WebSocketAdapter against a local stand-in server.
+
+    PYTHONPATH=$(pwd) python3 scripts/check_websocket.py
+
+Starts an aiohttp WebSocket server on a free local port that pushes two
+fills and then drops the connection. A third fill is published while the
+client is disconnected. After the reconnect the server pushes a fourth.
+Checks that stream() reconnects, that gap-fill runs on every connect and
+recovers the missed fill, starting from the second of the last pushed fill
+(so it repeats only fills pushed in that second, which the monitor drops by
+tx_hash), and that its cursor and the pushed mark are handed on with it. No
+external service or API key is needed.
+"""
+import asyncio
+import json
+import time
+from aiohttp import web
+from src.polymarket_monitor.adapter import BaseAdapter, WebSocketAdapter
+from src.polymarket_monitor.config import settings
+from src.polymarket_monitor.trade import TradeMapper
+
+NOW = int(time.time())
+
+
+def fill(n):
+    return {'id': f'f{n}', 'txHash': f'0xcheck{n}', 'trader': '0xwallet', 'amountUsd': 10 * n,
+            'market': {'id': 'm1', 'title': 'Check market'}, 'createdAt': NOW + n}
+
+
+class FeedServer:
+    """Fill log plus the WebSocket endpoint pushing it; drops the first connection."""
+    def __init__(self):
+        self.log = []
+        self.connections = 0
+        # Set by the gap-fill adapter once it has run for the current connection
+        self.gap_filled = asyncio.Event()
+
+    def publish(self, n, ws=None):
+        self.log.append(fill(n))
+        return ws.send_str(json.dumps(fill(n))) if ws is not None else None
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        # Push only after the client's gap-fill, so the run is deterministic
+        await self.gap_filled.wait()
+        self.gap_filled.clear()
+        if self.connections == 1:
+            await self.publish(1, ws)
+            await self.publish(2, ws)
+            await ws.close()
+            # Published while nobody is connected: only gap-fill can recover it
+            self.publish(3)
+        else:
+            await self.publish(4, ws)
+            async for _msg in ws:
+                pass
+        return ws
+
+
+class LogGapFill(BaseAdapter):
+    """Polling stand-in reading the server's fill log after its own cursor."""
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+        self.calls = 0
+        self.mapper = None
+
+    def cursor_sources(self):
+        return ['check-gapfill']
+
+    async def iter_trades(self):
+        self.calls += 1
+        since_ts, since_id = await self.get_cursor('check-gapfill')
+        # Mapped like the pushed fills, so amounts go through the same unit conversion
+        if self.mapper is None and self.server.log:
+            self.mapper = TradeMapper.discover(self.server.log)
+        for item in self.server.log:
+            key = (item['createdAt'], item['id'])
+            if key > (since_ts, since_id):
+                yield self.mapper(item)
+                since_ts, since_id = key
+        await self.set_cursor('check-gapfill', since_ts, since_id)
+        self.server.gap_filled.set()
+
+
+async def main():
+    settings.POLY_MARKET_KEYWORDS = settings.POLY_MARKET_EXCLUDE_KEYWORDS = settings.POLY_MARKET_IDS = ''
+    settings.POLY_WS_RECONNECT_BASE_SECONDS = 0.05
+    settings.POLY_WS_RECONNECT_MAX_SECONDS = 0.2
+
+    server = FeedServer()
+    app = web.Application()
+    app.router.add_get('/ws', server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    gap_fill = LogGapFill(server)
+    # Start the gap-fill cursor at "now" so the first connect has nothing to fill
+    gap_fill._cursors['check-gapfill'] = (NOW, '')
+    url = f'http://127.0.0.1:{port}/ws'
+    adapter = WebSocketAdapter(url, gap_fill=gap_fill)
+    batches = []
+    amounts = {}
+    cursors = {}
+
+    async def consume():
+        async for trades in adapter.stream():
+            batches.append([t.tx_hash for t in trades])
+            amounts.update((t.tx_hash, t.amount_usdc) for t in trades)
+            cursors.update(adapter.take_cursors())
+            if any('0xcheck4' in b for b in batches):
+                return
+
+    try:
+        await asyncio.wait_for(consume(), 10)
+        print('Batches:', batches)
+        assert server.connections == 2, f'expected one reconnect, saw {server.connections} connection(s)'
+        assert gap_fill.calls == 2, 'gap-fill runs on every (re)connect'
+        gap = [b for b in batches if '0xcheck3' in b]
+        assert gap == [['0xcheck2', '0xcheck3']], 'gap-fill starts at the last pushed second, recovers the missed fill once'
+        assert batches[:2] == [['0xcheck1'], ['0xcheck2']] and batches[-1] == ['0xcheck4'], 'pushed fills delivered'
+        assert amounts == {f'0xcheck{n}': 10.0 * n for n in range(1, 5)}, f'amounts in USDC: {amounts}'
+        assert cursors.get('check-gapfill') == (NOW + 3, 'f3'), f'gap-fill cursor handed on: {cursors}'
+        assert cursors.get(f'websocket:{url}') == (NOW + 4, ''), f'pushed mark handed on: {cursors}'
+        print('OK')
+    finally:
+        await adapter.close()
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,10 +1,10 @@
 import asyncio
 from src.polymarket_monitor.monitor import Monitor
-from src.polymarket_monitor import blockchain
+from src.polymarket_monitor.logs import setup_logging
 
 async def main():
     m = Monitor()
-    await m.store.init()
+    await m.start()
 
     print('\n-- Simulate single large trade (>=threshold) --')
     trade_large = {'tx_hash':'0xdemo1','wallet':'0xAAA','market_id':'0xM1','market_name':'Test Market','amount_usdc':m.threshold+100,'timestamp':1620000000}
@@ -19,9 +19,14 @@ async def main():
     await m.process_trade(trade_h3)
 
     print('\n-- Simulate new wallet alert (monkeypatch is_wallet_new -> True) --')
-    blockchain.is_wallet_new = lambda w: True
+    async def always_new(wallet, within_seconds=24*3600):
+        return True
+    m.wallet_age.is_wallet_new = always_new
     trade_new = {'tx_hash':'0xnew1','wallet':'0xNEW','market_id':'0xM3','market_name':'New Market','amount_usdc':5,'timestamp':1620000400}
     await m.process_trade(trade_new)
 
+    await m.close()
+
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1,33 @@
+"""Convert an existing SQLite store to incremental auto-vacuum (one-off).
+
+Databases created before it was the default never return purged space to
+the OS. The conversion is a full VACUUM that rewrites the file and blocks
+every writer meanwhile, so stop the monitor first:
+    PYTHONPATH=$(pwd) python3 scripts/enable_incremental_vacuum.py
+Afterwards the maintenance task frees pages incrementally
+(VACUUM_PAGES_PER_RUN). Other backends need no conversion.
+"""
+import asyncio
+import time
+from src.polymarket_monitor.logs import setup_logging
+from src.polymarket_monitor.store import get_store
+
+
+async def main():
+    store = get_store()
+    try:
+        await store.init()
+        size, free = await store.database_size()
+        print(f'Database: {size / 1e6:.1f} MB ({free / 1e6:.1f} MB free)')
+        started = time.monotonic()
+        if not await store.enable_incremental_vacuum():
+            print('Already in incremental auto-vacuum mode; nothing to do')
+            return
+        size, free = await store.database_size()
+        print(f'Converted in {time.monotonic() - started:.1f}s: {size / 1e6:.1f} MB ({free / 1e6:.1f} MB free)')
+    finally:
+        await store.close()
+
+if __name__ == '__main__':
+    setup_logging()
+    asyncio.run(main())
@@ -1,14 +1,18 @@
 import asyncio
 from src.polymarket_monitor.monitor import Monitor
+from src.polymarket_monitor.logs import setup_logging
 
 async def main():
     m = Monitor()
-    await m.store.init()
+    await m.start()
     print("Running single fetch iteration...")
     try:
         await m.run_once()
     except Exception as e:
         print("Error in run_once:", e)
+    finally:
+        await m.close()
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(main())
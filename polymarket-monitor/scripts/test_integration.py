@@ -3,6 +3,7 @@ import json
 import requests
 from src.polymarket_monitor.adapter import get_adapter
 from src.polymarket_monitor.config import settings
+from src.polymarket_monitor.logs import setup_logging
 from src.polymarket_monitor.blockchain import get_wallet_first_tx_timestamp, is_wallet_new
 from src.polymarket_monitor.alerts import send_alert_email
 
@@ -20,11 +21,13 @@ async def main():
         trades = await adapter.fetch_recent_trades()
     except Exception as e:
         print("Error fetching trades:", e)
+    finally:
+        await adapter.close()
 
     print("Fetched trades count:", len(trades) if trades is not None else 'None')
     for i, t in enumerate(trades[:10]):
         print(f"--- Trade {i+1} ---")
-        print(json.dumps(t, indent=2, ensure_ascii=False))
+        print(json.dumps(t._asdict(), indent=2, ensure_ascii=False))
 
     # Raw GraphQL POST test to inspect errors / auth requirements
     if settings.POLY_SOURCE_URL:
@@ -57,7 +60,7 @@ async def main():
 
     if trades:
         # test Etherscan lookup on first trade's wallet
-        first_wallet = trades[0].get('wallet')
+        first_wallet = trades[0].wallet
         print("Testing wallet chain history for:", first_wallet)
         try:
             ts = get_wallet_first_tx_timestamp(first_wallet)
@@ -74,4 +77,5 @@ async def main():
         print('Error sending test email:', e)
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(main())
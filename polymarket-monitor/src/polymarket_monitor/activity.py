@@ -0,0 +1,75 @@
+import time
+from bisect import insort
+from collections import deque
+
+
+class ActivityIndex:
+    """In-memory view of recent trading activity used by the per-trade signals.
+
+    Keeps a deque of trade timestamps per (wallet, market) pair, evicted once
+    they fall outside the window, plus the set of wallets ever seen. Tx hashes
+    inside the window are remembered so re-fetched fills are counted once.
+    It is warmed up from the Store at startup; SQLite remains the durable record.
+    """
+    def __init__(self, window_seconds=24*3600):
+        self.window_seconds = window_seconds
+        self._windows = {}
+        self._wallets = set()
+        self._seen_tx = {}
+
+    async def warm_up(self, store, keep=None):
+        """Load known wallets and the last window of trades; `keep(wallet)` limits
+        both to one shard when monitoring is split across worker processes."""
+        cutoff = int(time.time()) - self.window_seconds
+        for wallet in await store.known_wallets():
+            if keep is None or keep(wallet):
+                self._wallets.add(wallet)
+        for tx_hash, wallet, market_id, ts in await store.recent_trades(cutoff):
+            if keep is None or keep(wallet):
+                self.record(tx_hash, wallet, market_id, ts)
+
+    def record(self, tx_hash, wallet, market_id, timestamp):
+        """Add a trade to the index. Returns False if the tx was already counted."""
+        if wallet is None:
+            return True
+        self._wallets.add(wallet)
+        ts = int(timestamp)
+        if market_id is None or ts < int(time.time()) - self.window_seconds:
+            return True
+        if tx_hash is not None:
+            if tx_hash in self._seen_tx:
+                return False
+            self._seen_tx[tx_hash] = ts
+        window = self._windows.get((wallet, market_id))
+        if window is None:
+            window = self._windows[(wallet, market_id)] = deque()
+        if not window or ts >= window[-1]:
+            window.append(ts)
+        else:
+            # Feeds are usually newest-first; keep the deque sorted for eviction
+            insort(window, ts)
+        return True
+
+    def is_known_wallet(self, wallet):
+        return wallet is not None and wallet in self._wallets
+
+    def count_recent(self, wallet, market_id, now=None):
+        window = self._windows.get((wallet, market_id))
+        if not window:
+            return 0
+        cutoff = int(now if now is not None else time.time()) - self.window_seconds
+        while window and window[0] < cutoff:
+            window.popleft()
+        return len(window)
+
+    def prune(self, now=None):
+        """Evict expired timestamps everywhere and drop empty windows."""
+        cutoff = int(now if now is not None else time.time()) - self.window_seconds
+        for key in list(self._windows):
+            window = self._windows[key]
+            while window and window[0] < cutoff:
+                window.popleft()
+            if not window:
+                del self._windows[key]
+        for tx_hash in [tx for tx, ts in self._seen_tx.items() if ts < cutoff]:
+            del self._seen_tx[tx_hash]
@@ -1,46 +1,253 @@
 import asyncio
 import aiohttp
+import json
+import logging
+import random
 import time
-import requests
 from .config import settings
+from .filters import get_market_filter
+from .markets import MarketResolver
+from .metrics import SOURCE_BUFFERED, SOURCE_CONSECUTIVE_ERRORS, SOURCE_FETCHES, SOURCE_LAG, SOURCE_LAST_SUCCESS
+from .trade import TradeMapper
+from .upstream import UpstreamClient, UpstreamError
+
+log = logging.getLogger(__name__)
 
 class BaseAdapter:
-    async def fetch_recent_trades(self):
-        """Return an iterable of trade dicts with keys:
-           tx_hash, wallet, market_id, market_name, amount_usdc, timestamp
+    # Streaming adapters push trades through `stream()` instead of being polled
+    streaming = False
+
+    def __init__(self):
+        # Optional Store used to persist per-source high-water marks (set by Monitor)
+        self.store = None
+        self._cursors = {}
+        # Cursor moves not yet handed to the consumer (see take_cursors)
+        self._unsaved_cursors = {}
+        self._discovery = {}
+        self._session = None
+        # Shared market filter, applied to raw items before they are mapped
+        self.market_filter = get_market_filter()
+        # Circuit breakers, retries and endpoint stats for this adapter's requests
+        self.upstream = UpstreamClient(self.__class__.__name__)
+        # Set when the last fetch got no usable upstream response (None when healthy);
+        # the poll scheduler backs off on it
+        self.last_error = None
+
+    async def iter_trades(self):
+        """Async generator yielding normalized `Trade` records as pages arrive,
+        so consumers can start before the fetch completes.
         """
         raise NotImplementedError
+        yield
 
-class MockAdapter(BaseAdapter):
     async def fetch_recent_trades(self):
-        # Return empty list for now; used for testing
+        """Return all trades of one fetch as a list (thin wrapper over iter_trades)."""
+        return [t async for t in self.iter_trades()]
+
+    async def start(self):
+        """Hook for adapters that run background work; called by Monitor.start()."""
+        pass
+
+    def backfill_streams(self):
+        """Names of the independently paged streams a backfill walks (empty: unsupported)."""
         return []
 
+    async def fetch_range(self, stream, since, until, limit):
+        """Return (trades, next_cursor) for one page of `stream` after the
+        (timestamp, id) mark `since` and strictly before timestamp `until`.
+        next_cursor is None once the range is exhausted. Persisted cursors are
+        not touched; raises on upstream failure so a backfill can retry.
+        """
+        raise NotImplementedError
+
+    async def get_session(self):
+        """Return the adapter's long-lived aiohttp session, creating it on first use.
+        Keeping one session across polls reuses pooled keep-alive connections.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_CONNECTOR_LIMIT,
+                ttl_dns_cache=settings.HTTP_DNS_CACHE_SECONDS,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._on_new_session()
+        return self._session
+
+    def _on_new_session(self):
+        pass
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_cursor(self, source):
+        """Return the (timestamp, id) high-water mark for `source`.
+        Falls back to now - POLY_CURSOR_LOOKBACK_SECONDS for unseen sources.
+        """
+        if source not in self._cursors:
+            saved = await self.store.get_cursor(source) if self.store else None
+            if saved is None:
+                saved = (int(time.time()) - settings.POLY_CURSOR_LOOKBACK_SECONDS, '')
+            self._cursors[source] = (int(saved[0]), saved[1] or '')
+        return self._cursors[source]
+
+    async def set_cursor(self, source, timestamp, last_id):
+        """Move the mark past trades already yielded. Not written to the Store
+        here: the consumer saves it via take_cursors() once those trades are."""
+        if self._cursors.get(source) == (timestamp, last_id):
+            return
+        self._cursors[source] = (timestamp, last_id)
+        self._unsaved_cursors[source] = (timestamp, last_id)
+
+    def cursor_sources(self):
+        """Keys of the high-water marks iter_trades() pages from (empty: no cursor)."""
+        return []
+
+    async def skip_to(self, timestamp):
+        """Move every mark still behind `timestamp` up to (timestamp, ''), for
+        when everything older is known to be delivered already (e.g. pushed)."""
+        for source in self.cursor_sources():
+            if await self.get_cursor(source) < (timestamp, ''):
+                await self.set_cursor(source, timestamp, '')
+
+    def take_cursors(self):
+        """Return and clear the cursor moves since the last call, as
+        {source: (timestamp, id)}. They only cover trades yielded before the
+        call, so saving them with (or after) those trades never skips any.
+        """
+        cursors, self._unsaved_cursors = self._unsaved_cursors, {}
+        return cursors
+
+    async def get_discovery(self, source):
+        """Return the cached schema/endpoint discovery for `source`, or None once
+        it is missing or older than POLY_DISCOVERY_TTL_SECONDS (forcing a re-probe).
+        """
+        if source not in self._discovery:
+            saved = await self.store.get_discovery(source) if self.store else None
+            self._discovery[source] = saved
+        entry = self._discovery[source]
+        if entry is None:
+            return None
+        value, discovered_at = entry
+        if time.time() - discovered_at > settings.POLY_DISCOVERY_TTL_SECONDS:
+            return None
+        return value
+
+    async def set_discovery(self, source, value):
+        now = int(time.time())
+        self._discovery[source] = (value, now)
+        if self.store:
+            await self.store.set_discovery(source, value, now)
+
+    async def clear_discovery(self, source):
+        self._discovery[source] = None
+        if self.store:
+            await self.store.clear_discovery(source)
+
+def _find_list(root):
+    """Locate the first list in a GraphQL `data` object (at most one level deep).
+    Returns the key path to it, or None.
+    """
+    # Find the first list-like value in the data root
+    for k, v in root.items():
+        if isinstance(v, list):
+            return [k]
+    # maybe nested under a field
+    # try to flatten one more level
+    for k, v in root.items():
+        if isinstance(v, dict):
+            for kk, vv in v.items():
+                if isinstance(vv, list):
+                    return [k, kk]
+    return None
+
+def _resolve_path(data, path):
+    node = data.get('data') if isinstance(data, dict) else None
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node if isinstance(node, list) else None
+
+class MockAdapter(BaseAdapter):
+    async def iter_trades(self):
+        # Yield nothing for now; used for testing
+        return
+        yield
+
 class RestAdapter(BaseAdapter):
     def __init__(self, url):
+        super().__init__()
         self.url = url
+        self._mapper = None
 
-    async def fetch_recent_trades(self):
+    async def iter_trades(self):
         # This is a generic placeholder - user should provide real endpoint
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(self.url, timeout=10) as resp:
-                    data = await resp.json()
-                    # User must map data -> expected trade dicts
-                    # Here we assume data is list of trades already matching our keys
-                    return data
-            except Exception as e:
-                print('Error fetching trades from rest adapter', e)
-                return []
+        session = await self.get_session()
+        try:
+            _endpoint, _status, data = await self.upstream.request(session, 'GET', [self.url])
+        except UpstreamError as e:
+            log.warning('Error fetching trades from rest adapter: %s', e)
+            self.last_error = str(e)
+            return
+        self.last_error = None
+        # User must map data -> expected trade dicts
+        # Here we assume data is a list of trades using our keys (or common aliases)
+        items = [t for t in data or [] if isinstance(t, dict)] if isinstance(data, list) else []
+        if items and self._mapper is None:
+            self._mapper = TradeMapper.discover(items)
+        admits = self.market_filter.admits_item
+        for item in items:
+            if admits(self._mapper, item):
+                yield self._mapper(item)
 
 class PolymarketGammaAdapter(BaseAdapter):
     """A GraphQL adapter tuned to Polymarket's Gamma API.
     It will try a configurable query from env var `POLY_GRAPHQL_TRADES_QUERY`,
     otherwise it attempts several common trade queries and maps fields into
-    the internal trade dict format.
+    `Trade` records, with a field mapper resolved once per discovered query.
+
+    Fetching is incremental: each query receives `$since`/`$sinceId`/`$limit`
+    variables from a persisted high-water mark and pages forward until caught
+    up. The first queries resume after the exact (timestamp, id) mark on the
+    server; the `_gte` fallbacks for schemas without `or` filters can only
+    resume from the second, so a full page stuck inside one second is
+    skipped past with a warning (see `_stuck`). Items at or below the mark
+    are dropped client-side as well, so schemas that ignore the filter are
+    never re-processed.
     """
+    # Common field names used in different schemas
+    CANDIDATE_QUERIES = [
+        '''query Fills($limit:Int,$since:Int,$sinceId:ID){ fills(limit:$limit, where:{or:[{createdAt_gt:$since},{createdAt:$since, id_gt:$sinceId}]}, orderBy:"createdAt", orderDirection:"asc") { id txHash trader amountUsd market { id title } createdAt } }''',
+        '''query Trades($limit:Int,$since:Int,$sinceId:ID){ trades(limit:$limit, where:{or:[{timestamp_gt:$since},{timestamp:$since, id_gt:$sinceId}]}, orderBy:"timestamp", orderDirection:"asc") { id txHash wallet amount market { id title } timestamp } }''',
+        '''query Fills($limit:Int,$since:Int){ fills(limit:$limit, where:{createdAt_gte:$since}, orderBy:"createdAt", orderDirection:"asc") { id txHash trader amountUsd market { id title } createdAt } }''',
+        '''query Trades($limit:Int,$since:Int){ trades(limit:$limit, where:{timestamp_gte:$since}, orderBy:"timestamp", orderDirection:"asc") { id txHash wallet amount market { id title } timestamp } }''',
+        '''query { fills(limit:50) { txHash trader amountUsd market { id title } createdAt } }''',
+        '''query { fills(limit:50) { id txHash trader amount market { id title name } createdAt } }''',
+        '''query { trades(limit:50) { id txHash wallet amount market { id title } timestamp } }''',
+        '''query { trades(limit:50) { txHash actor amount outcome { market { id title } } timestamp } }'''
+    ]
+
     def __init__(self, url):
+        super().__init__()
         self.url = url
+        self._primed = False
+        # Discovered query -> TradeMapper for its result shape
+        self._mappers = {}
+
+    def _on_new_session(self):
+        # Server-set cookies live in the session's cookie jar; re-prime a fresh one
+        self._primed = False
+
+    def _query_endpoint(self):
+        # Ensure endpoint points to /query
+        endpoint = self.url
+        if endpoint.endswith('/'):
+            endpoint = endpoint + 'query'
+        elif not endpoint.endswith('/query'):
+            endpoint = endpoint + '/query'
+        return endpoint
 
     async def _post(self, session, query, variables=None):
         payload = {'query': query}
@@ -59,129 +266,206 @@ class PolymarketGammaAdapter(BaseAdapter):
         if settings.POLY_AUTH_COOKIE:
             headers['Cookie'] = settings.POLY_AUTH_COOKIE
 
-        # Ensure endpoint points to /query
-        endpoint = self.url
-        if endpoint.endswith('/'):
-            endpoint = endpoint + 'query'
-        elif not endpoint.endswith('/query'):
-            endpoint = endpoint + '/query'
+        endpoint = self._query_endpoint()
 
-        # If no explicit cookie provided, try a GET to establish any server-set cookies
-        if not settings.POLY_AUTH_COOKIE:
+        # If no explicit cookie provided, try a GET (once per session) to establish any server-set cookies
+        if not settings.POLY_AUTH_COOKIE and not self._primed:
+            self._primed = True
             try:
-                await session.get(self.url, timeout=10)
+                async with session.get(self.url, timeout=10) as resp:
+                    await resp.read()
             except Exception:
                 pass
 
-        try:
-            async with session.post(endpoint, headers=headers or None, json=payload, timeout=15) as resp:
-                text = await resp.text()
-                try:
-                    return await resp.json()
-                except Exception:
-                    return {'errors': [{'message': 'Non-JSON response', 'status': resp.status, 'text': text[:1000]}]}
-        except Exception as e:
-            return {'errors': [{'message': f'Network error: {e}'}]}
-
-    def _map_trade(self, item):
-        # Flexible mapping for different field names
-        tx = item.get('txHash') or item.get('tx_hash') or item.get('id') or item.get('txhash')
-        wallet = item.get('trader') or item.get('wallet') or item.get('actor') or item.get('owner')
-        amount = item.get('amountUsd') or item.get('amount') or item.get('value') or 0
-        market = item.get('market') or item.get('marketId') or {}
-        market_id = None
-        market_name = None
-        if isinstance(market, dict):
-            market_id = market.get('id')
-            market_name = market.get('title') or market.get('name')
-        else:
-            market_id = item.get('market_id') or item.get('marketId')
-        ts = item.get('createdAt') or item.get('timestamp') or item.get('time')
-        try:
-            ts = int(ts)
-        except Exception:
-            ts = int(time.time())
-        try:
-            amount = float(amount)
-        except Exception:
-            amount = 0.0
-        return {
-            'tx_hash': tx,
-            'wallet': wallet,
-            'market_id': market_id,
-            'market_name': market_name,
-            'amount_usdc': amount,
-            'timestamp': ts
-        }
+        # GraphQL errors come back as JSON too: only transport failures, 429 and 5xx count
+        # against the endpoint, and they raise UpstreamError instead of looking like a schema miss
+        _endpoint, _status, data = await self.upstream.request(
+            session, 'POST', [endpoint], accept=self._answered, timeout=15, headers=headers or None, json=payload,
+        )
+        return data
 
-    async def fetch_recent_trades(self):
-        async with aiohttp.ClientSession() as session:
-            # If user provided a custom query via env, use it
-            custom = settings.POLY_GRAPHQL_TRADES_QUERY
-            candidate_queries = []
-            if custom:
-                candidate_queries.append(custom)
-
-            # Common field names used in different schemas
-            candidate_queries += [
-                '''query { fills(limit:50) { txHash trader amountUsd market { id title } createdAt } }''',
-                '''query { fills(limit:50) { id txHash trader amount market { id title name } createdAt } }''',
-                '''query { trades(limit:50) { id txHash wallet amount market { id title } timestamp } }''',
-                '''query { trades(limit:50) { txHash actor amount outcome { market { id title } } timestamp } }'''
-            ]
-
-            for q in candidate_queries:
-                try:
-                    data = await self._post(session, q)
-                except Exception as e:
-                    # try next query
-                    continue
-
-                if not data or 'data' not in data:
-                    continue
-
-                # Find the first list-like value in the data root
-                root = data['data']
-                list_found = None
-                for v in root.values():
-                    if isinstance(v, list):
-                        list_found = v
-                        break
-
-                if not list_found:
-                    # maybe nested under a field
-                    # try to flatten one more level
-                    for v in root.values():
-                        if isinstance(v, dict):
-                            for vv in v.values():
-                                if isinstance(vv, list):
-                                    list_found = vv
-                                    break
-                            if list_found:
-                                break
-
-                if not list_found:
-                    continue
-
-                # Map items and apply market keyword filter if provided
-                keywords = [k.strip().lower() for k in (settings.POLY_MARKET_KEYWORDS or '').split(',') if k.strip()]
-                mapped = []
-                for item in list_found:
-                    t = self._map_trade(item)
-                    if keywords and t.get('market_name'):
-                        name = (t.get('market_name') or '').lower()
-                        if not any(kw in name for kw in keywords):
-                            continue
-                    mapped.append(t)
-                return mapped
-
-            # Fallback empty
-            return []
+    @staticmethod
+    def _answered(status, payload):
+        return status < 500 and status != 429 and isinstance(payload, dict)
+
+    def _mapper_for(self, query, items):
+        mapper = self._mappers.get(query)
+        if mapper is None or 'tx_hash' not in mapper.paths:
+            mapper = TradeMapper.discover(items)
+            # An empty (caught-up) page says nothing about the shape: only keep a mapper that found fields
+            if 'tx_hash' in mapper.paths:
+                self._mappers[query] = mapper
+        return mapper
+
+    async def _probe(self, session, variables):
+        """Try every candidate query; return (items, query, list path) for the first that works."""
+        for q in self._allowed_queries():
+            # An upstream failure ends the probe (raised); a rejected query moves on to the next
+            data = await self._post(session, q, variables)
+            if not data or 'data' not in data or not isinstance(data['data'], dict):
+                continue
+
+            path = _find_list(data['data'])
+            if path is None:
+                continue
+            return _resolve_path(data, path), q, path
+        return None, None, None
+
+    async def _fetch_page(self, session, variables):
+        """Return (raw items, mapper) for one page, or (None, None) if no candidate
+        query works. The winning (endpoint, query, list path) is cached so a
+        healthy poll costs a single request; only a schema miss on the cached
+        shape (a GraphQL error or no list at its path) triggers a re-probe,
+        while upstream failures raise UpstreamError and keep it. The mapper is
+        chosen from the first items of each query shape.
+        """
+        source = f'gamma-schema:{self.url}'
+        cached = await self.get_discovery(source)
+        if cached and cached.get('query') in self._allowed_queries():
+            data = await self._post(session, cached['query'], variables)
+            items = _resolve_path(data, cached.get('path') or [])
+            if items is not None:
+                return items, self._mapper_for(cached['query'], items)
+            await self.clear_discovery(source)
+
+        items, query, path = await self._probe(session, variables)
+        if query is None:
+            return None, None
+        await self.set_discovery(source, {'endpoint': self._query_endpoint(), 'query': query, 'path': path})
+        # Re-probed: the result shape may have changed with the query
+        self._mappers.pop(query, None)
+        return items, self._mapper_for(query, items)
+
+    def _allowed_queries(self):
+        custom = settings.POLY_GRAPHQL_TRADES_QUERY
+        return ([custom] if custom else []) + self.CANDIDATE_QUERIES
+
+    @staticmethod
+    def _fresh(items, mapper, since):
+        """(key, raw item) for items past the (timestamp, id) mark, oldest first.
+        Items are not mapped yet: filtered-out items still move the mark.
+        """
+        fresh = []
+        for item in items:
+            key = (mapper.timestamp(item), str(item.get('id') or mapper.tx_hash(item) or ''))
+            if key > since:
+                fresh.append((key, item))
+        fresh.sort(key=lambda ki: ki[0])
+        return fresh
+
+    @staticmethod
+    def _stuck(items, mapper, since, limit):
+        """True for a full page with nothing past the mark, all within the mark's
+        second: a `_gte` query would return it forever, so the caller moves on."""
+        return len(items) >= limit and all(mapper.timestamp(item) == since[0] for item in items)
+
+    def cursor_sources(self):
+        return [f'gamma:{self.url}']
+
+    def backfill_streams(self):
+        return ['fills']
+
+    async def fetch_range(self, stream, since, until, limit):
+        session = await self.get_session()
+        items, mapper = await self._fetch_page(session, {'limit': limit, 'since': since[0], 'sinceId': since[1]})
+        if items is None:
+            raise RuntimeError('No candidate query succeeded')
+        # The candidate queries have no upper bound; stop at the first item past `until`
+        fresh = self._fresh(items, mapper, since)
+        if not fresh and self._stuck(items, mapper, since, limit):
+            log.warning('More than %d Gamma items at timestamp %s; skipping the rest of that second', limit, since[0])
+            return [], (since[0] + 1, '')
+        in_range = [(key, item) for key, item in fresh if key[0] < until]
+        admits = self.market_filter.admits_item
+        trades = [mapper(item) for _key, item in in_range if admits(mapper, item)]
+        if not in_range or len(in_range) < len(fresh) or len(items) < limit:
+            return trades, None
+        return trades, in_range[-1][0]
+
+    async def iter_trades(self):
+        source = f'gamma:{self.url}'
+        since_ts, since_id = await self.get_cursor(source)
+        page_size = settings.POLY_PAGE_SIZE
+        admits = self.market_filter.admits_item
+        self.last_error = None
+        session = await self.get_session()
+        for _ in range(settings.POLY_MAX_PAGES_PER_POLL):
+            try:
+                items, mapper = await self._fetch_page(session, {'limit': page_size, 'since': since_ts, 'sinceId': since_id})
+            except UpstreamError as e:
+                log.warning('Error fetching trades from Gamma: %s', e, extra={'source': source})
+                self.last_error = str(e)
+                break
+            if items is None:
+                self.last_error = 'No candidate query succeeded'
+                break
+            if not items:
+                break
+
+            fresh = self._fresh(items, mapper, (since_ts, since_id))
+            if not fresh and self._stuck(items, mapper, (since_ts, since_id), page_size):
+                log.warning('More than %d Gamma items at timestamp %s; skipping the rest of that second',
+                            page_size, since_ts, extra={'source': source})
+                since_ts, since_id = since_ts + 1, ''
+                await self.set_cursor(source, since_ts, since_id)
+                continue
+            if not fresh:
+                # Caught up (or the schema ignores our filter and returned old rows)
+                break
+            since_ts, since_id = fresh[-1][0]
+
+            for _key, item in fresh:
+                if admits(mapper, item):
+                    yield mapper(item)
+            # Moved per page, so a consumer that stops early resumes from here
+            await self.set_cursor(source, since_ts, since_id)
+
+            if len(items) < page_size:
+                break
 
 class TheGraphAdapter(BaseAdapter):
-    """Adapter to query Polymarket's public subgraph on The Graph or Goldsky."""
+    """Adapter to query Polymarket's public subgraph on The Graph or Goldsky.
+
+    All activity entities are fetched with one combined GraphQL document.
+    Requests go to the cheapest healthy candidate by latency and error rate
+    (see UpstreamClient), starting from the endpoint that answered last
+    (persisted, with a TTL); while no candidate is known to work they are all
+    queried concurrently and the first healthy one is remembered. Items only carry condition / negRisk
+    market ids; condition ids on each page are resolved to market titles
+    and tags (see MarketResolver) and everything is run through the market
+    filter before it is mapped. negRisk market ids have no Gamma lookup:
+    negRiskConversions keep the id as their name and pass keyword filters.
+    """
+    # Activity-subgraph entities and the fields requested for each
+    ENTITIES = [
+        ('negRiskConversions', 'id stakeholder negRiskMarketId amount timestamp'),
+        ('splits', 'id stakeholder condition amount timestamp'),
+        ('merges', 'id stakeholder condition amount timestamp'),
+        ('redemptions', 'id redeemer condition payout timestamp'),
+    ]
+    # Per-entity field mappers; amounts are integer base units (6 decimals for USDC),
+    # ids are "<tx>_<log index>", and market_name is the raw condition id until resolved
+    MAPPERS = {
+        'negRiskConversions': TradeMapper({'tx_hash': 'id', 'wallet': 'stakeholder', 'market_id': 'negRiskMarketId',
+                                           'market_name': 'negRiskMarketId', 'amount': 'amount', 'timestamp': 'timestamp'},
+                                          base_units=True, tx_sep='_'),
+        'splits': TradeMapper({'tx_hash': 'id', 'wallet': 'stakeholder', 'market_id': 'condition',
+                               'market_name': 'condition', 'amount': 'amount', 'timestamp': 'timestamp'},
+                              base_units=True, tx_sep='_'),
+        'redemptions': TradeMapper({'tx_hash': 'id', 'wallet': 'redeemer', 'market_id': 'condition',
+                                    'market_name': 'condition', 'amount': 'payout', 'timestamp': 'timestamp'},
+                                   base_units=True, tx_sep='_'),
+    }
+    MAPPERS['merges'] = MAPPERS['splits']
+    # Gamma's markets lookup only takes condition ids
+    UNRESOLVED = {'negRiskConversions'}
+    # Discovery-cache key for the last healthy endpoint
+    DISCOVERY_SOURCE = 'thegraph-endpoint'
+
     def __init__(self, url):
+        super().__init__()
         self.url = url
+        self.markets = MarketResolver()
         # candidate fallback endpoints to try when default is unavailable
         self.candidates = [
             url,
@@ -197,150 +481,552 @@ class TheGraphAdapter(BaseAdapter):
             'https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/pnl-subgraph/0.0.14/gn'
         ]
 
-    def _post(self, query, variables=None):
+    @staticmethod
+    def _healthy(status, j):
+        # The Graph sometimes returns a 200 with errors: only actual graph data counts
+        data = j.get('data') if isinstance(j, dict) else None
+        return isinstance(data, dict) and any(isinstance(v, list) for v in data.values())
+
+    async def _post(self, query, variables=None):
         payload = {'query': query}
         if variables:
             payload['variables'] = variables
-        last_err = None
-        for endpoint in self.candidates:
-            if not endpoint:
-                continue
+        session = await self.get_session()
+        cached = await self.get_discovery(self.DISCOVERY_SOURCE)
+        prefer = cached.get('endpoint') if cached else None
+        try:
+            if prefer in self.candidates or self.upstream.known_good(self.candidates):
+                # Steady state: the cheapest healthy endpoint, falling over (and optionally
+                # hedging) to the next; dead ones sit behind open circuits
+                endpoint, _status, j = await self.upstream.request(
+                    session, 'POST', self.candidates, accept=self._healthy, prefer=prefer, json=payload,
+                )
+            else:
+                # Nothing known to work: ask every candidate whose circuit is closed at once
+                endpoint, _status, j = await self.upstream.race(session, 'POST', self.candidates, accept=self._healthy, json=payload)
+        except UpstreamError as e:
+            if prefer:
+                await self.clear_discovery(self.DISCOVERY_SOURCE)
+            return {'errors': [{'message': str(e)}]}
+        if endpoint != prefer:
+            await self.set_discovery(self.DISCOVERY_SOURCE, {'endpoint': endpoint})
+        return j
+
+    @staticmethod
+    def _page_query(entities):
+        # One document with a field per entity, each with its own cursor variables.
+        # Oldest-first after the (timestamp, id) high-water mark; graph-node breaks
+        # timestamp ties by id, so the `or` filter resumes exactly where we stopped.
+        params = ['$first:Int']
+        fields = []
+        for name, selection in entities:
+            params.append(f'$since_{name}:BigInt,$sinceId_{name}:ID')
+            fields.append(
+                f'{name}(first:$first, orderBy: timestamp, orderDirection: asc, '
+                f'where:{{or:[{{timestamp_gt:$since_{name}}},{{timestamp:$since_{name}, id_gt:$sinceId_{name}}}]}}) '
+                f'{{ {selection} }}'
+            )
+        return f'query Page({",".join(params)}){{ {" ".join(fields)} }}'
+
+    @staticmethod
+    def _range_query(name, selection):
+        # One entity between the (timestamp, id) mark and `until` (exclusive), oldest first
+        return (
+            f'query Range($first:Int,$since:BigInt,$sinceId:ID,$until:BigInt){{ '
+            f'{name}(first:$first, orderBy: timestamp, orderDirection: asc, '
+            f'where:{{or:[{{timestamp_gt:$since, timestamp_lt:$until}},{{timestamp:$since, id_gt:$sinceId}}]}}) '
+            f'{{ {selection} }} }}'
+        )
+
+    def backfill_streams(self):
+        return [name for name, _fields in self.ENTITIES]
+
+    async def fetch_range(self, stream, since, until, limit):
+        selection = dict(self.ENTITIES)[stream]
+        variables = {'first': limit, 'since': str(since[0]), 'sinceId': since[1], 'until': str(until)}
+        data = await self._post(self._range_query(stream, selection), variables)
+        if not data or 'data' not in data:
+            raise RuntimeError(str((data or {}).get('errors') or 'No data'))
+        items = data['data'].get(stream) or []
+        mapper = self.MAPPERS[stream]
+        trades = await self._select([(mapper, it) for it in items])
+        if len(items) < limit:
+            return trades, None
+        last = items[-1]
+        return trades, (int(last.get('timestamp') or since[0]), last.get('id') or since[1])
+
+    async def _select(self, rows):
+        """Map the (mapper, raw item) rows whose market passes the market filter.
+
+        Condition ids are resolved to titles and tags in bulk first, so
+        keywords are matched against the title or any tag, and kept trades
+        carry the title as market_name. Markets that can't be resolved (Gamma
+        down, an id it doesn't know, or a negRisk market id) keep their id as
+        the name and are not dropped by keywords.
+        """
+        if not rows:
+            return []
+        markets = [mapper.market(item) for mapper, item in rows]
+        unresolved = [self.MAPPERS[name] for name in self.UNRESOLVED]
+        wanted = {m[0] for (mapper, _item), m in zip(rows, markets) if mapper not in unresolved}
+        try:
+            resolved = await self.markets.resolve(wanted, await self.get_session(), self.store)
+        except Exception as e:
+            log.warning('Error resolving market names: %s', e)
+            resolved = {}
+        admits = self.market_filter.admits
+        trades = []
+        for (mapper, item), (market_id, name) in zip(rows, markets):
+            meta = resolved.get(market_id)
             try:
-                r = requests.post(endpoint, json=payload, timeout=10)
-                # sometimes The Graph returns a 200 with errors, so check json
-                try:
-                    j = r.json()
-                except Exception:
-                    j = {'errors': [{'message': f'Non-JSON response: HTTP {r.status_code}'}]}
-                # if returned graph data, return
-                if 'data' in j and any(isinstance(v, list) for v in j['data'].values()):
-                    return j
-                # if errors, capture and try next candidate
-                last_err = j.get('errors') or [{'message': f'HTTP {r.status_code}'}]
-            except Exception as e:
-                last_err = [{'message': str(e)}]
-        return {'errors': last_err or [{'message': 'No endpoint available'}]}
-    async def fetch_recent_trades(self):
-        # The activity subgraph exposes several event types (negRiskConversions, splits, merges, redemptions, etc.).
-        # Try a set of candidate entity queries and map any returned items to the internal trade dict format.
-        candidates = [
-            ('negRiskConversions', '''query RecentNegRisk($first:Int){ negRiskConversions(first:$first, orderBy: timestamp, orderDirection: desc) { id stakeholder negRiskMarketId amount timestamp } }'''),
-            ('splits', '''query RecentSplits($first:Int){ splits(first:$first, orderBy: timestamp, orderDirection: desc) { id stakeholder condition amount timestamp } }'''),
-            ('merges', '''query RecentMerges($first:Int){ merges(first:$first, orderBy: timestamp, orderDirection: desc) { id stakeholder condition amount timestamp } }'''),
-            ('redemptions', '''query RecentRedemptions($first:Int){ redemptions(first:$first, orderBy: timestamp, orderDirection: desc) { id redeemer condition payout timestamp } }'''),
-        ]
+                if meta is None:
+                    if admits(market_id, name):
+                        trades.append(mapper(item))
+                elif admits(market_id, meta[0], meta[1]):
+                    trades.append(mapper(item)._replace(market_name=meta[0]))
+            except Exception:
+                continue
+        return trades
+
+    def cursor_sources(self):
+        return [f'thegraph:{name}' for name, _fields in self.ENTITIES]
 
-        for name, q in candidates:
-            data = self._post(q, {'first': 50})
+    async def iter_trades(self):
+        """Page every entity forward from its own cursor until caught up.
+        All entities still behind share one combined request per page; each
+        page is yielded oldest-first as soon as it is mapped.
+        """
+        # The activity subgraph exposes several event types (negRiskConversions, splits, merges, redemptions, etc.).
+        page_size = settings.POLY_PAGE_SIZE
+        cursors = {}
+        for name, _fields in self.ENTITIES:
+            cursors[name] = await self.get_cursor(f'thegraph:{name}')
+        active = list(self.ENTITIES)
+        self.last_error = None
+        for _ in range(settings.POLY_MAX_PAGES_PER_POLL):
+            if not active:
+                break
+            variables = {'first': page_size}
+            for name, _fields in active:
+                since_ts, since_id = cursors[name]
+                variables[f'since_{name}'] = str(since_ts)
+                variables[f'sinceId_{name}'] = since_id
+            data = await self._post(self._page_query(active), variables)
             if not data or 'data' not in data:
-                continue
-            items = data['data'].get(name) or []
-            if not items:
-                continue
-            mapped = []
-            for it in items:
-                try:
-                    idv = it.get('id')
-                    tx = idv.split('_')[0] if idv and '_' in idv else idv
-                    if name == 'negRiskConversions':
-                        wallet = it.get('stakeholder')
-                        market_id = it.get('negRiskMarketId')
-                        amount_raw = it.get('amount') or 0
-                    elif name in ('splits', 'merges'):
-                        wallet = it.get('stakeholder')
-                        market_id = it.get('condition')
-                        amount_raw = it.get('amount') or 0
-                    elif name == 'redemptions':
-                        wallet = it.get('redeemer')
-                        market_id = it.get('condition')
-                        amount_raw = it.get('payout') or 0
-                    else:
-                        wallet = None
-                        market_id = None
-                        amount_raw = 0
-
-                    # Amounts appear to be in integer base units (e.g., 6 decimals for USDC)
-                    try:
-                        amount = float(int(amount_raw)) / 1e6
-                    except Exception:
-                        try:
-                            amount = float(amount_raw)
-                        except Exception:
-                            amount = 0.0
-                    ts = int(it.get('timestamp') or 0)
-                    mapped.append({
-                        'tx_hash': tx,
-                        'wallet': wallet,
-                        'market_id': market_id,
-                        'market_name': market_id,
-                        'amount_usdc': amount,
-                        'timestamp': ts
-                    })
-                except Exception:
-                    continue
-
-            # Apply optional market keyword filter (if configured).
-            # If market_name is just an address/id (starts with 0x), treat it as unknown and do NOT drop it
-            keywords = [k.strip().lower() for k in (settings.POLY_MARKET_KEYWORDS or '').split(',') if k.strip()]
-            if keywords:
-                filtered = []
-                for t in mapped:
-                    name_val_raw = (t.get('market_name') or '')
-                    if name_val_raw.startswith('0x'):
-                        # unknown human-readable name, include so it won't be dropped
-                        filtered.append(t)
-                        continue
-                    name_val = name_val_raw.lower()
-                    if any(kw in name_val for kw in keywords):
-                        filtered.append(t)
-                if filtered:
-                    return filtered
-                else:
-                    # no matches here; continue to next candidate
-                    continue
-
-            return mapped
-
-        # Nothing found
-        return []
+                self.last_error = str((data or {}).get('errors') or 'No data')
+                break
+            rows = []
+            still_behind = []
+            for entity in active:
+                name = entity[0]
+                items = data['data'].get(name) or []
+                mapper = self.MAPPERS[name]
+                rows.extend((mapper, it) for it in items)
+                if items:
+                    last = items[-1]
+                    since_ts, since_id = cursors[name]
+                    cursors[name] = (int(last.get('timestamp') or since_ts), last.get('id') or since_id)
+                if len(items) >= page_size:
+                    still_behind.append(entity)
+            page = await self._select(rows)
+            page.sort(key=lambda t: t.timestamp)
+            for t in page:
+                yield t
+            for entity in active:
+                since_ts, since_id = cursors[entity[0]]
+                await self.set_cursor(f'thegraph:{entity[0]}', since_ts, since_id)
+            active = still_behind
 
 class GraphQLAdapter(BaseAdapter):
     def __init__(self, url):
+        super().__init__()
         self.url = url
+        self._mapper = None
 
-    async def fetch_recent_trades(self):
+    async def iter_trades(self):
         # Generic GraphQL adapter - try to use a user-provided query if present
         custom = settings.POLY_GRAPHQL_TRADES_QUERY
         if not custom:
+            return
+        session = await self.get_session()
+        self.last_error = None
+        try:
+            _endpoint, _status, data = await self.upstream.request(session, 'POST', [self.url], json={'query': custom})
+        except UpstreamError as e:
+            log.warning('Error fetching trades from graphql adapter: %s', e)
+            self.last_error = str(e)
+            return
+        # Attempt to extract list similarly
+        root = data.get('data') or {}
+        for v in root.values():
+            if isinstance(v, list):
+                # The custom query is fixed, so its field mapping is resolved once
+                if v and self._mapper is None:
+                    self._mapper = TradeMapper.discover(v)
+                admits = self.market_filter.admits_item
+                for item in v:
+                    if admits(self._mapper, item):
+                        yield self._mapper(item)
+                return
+
+
+class WebSocketAdapter(BaseAdapter):
+    """Push-based adapter consuming trade events from a WebSocket feed.
+
+    `stream()` is an async generator yielding lists of trade dicts (one list
+    per message, or per gap-fill). On every (re)connect the optional polling
+    `gap_fill` adapter is asked for what was missed while disconnected; it is
+    cursor-based, so this covers the gap (plus any pushed trades past its
+    cursor, which Monitor drops by tx_hash). Pushed trades move a
+    `websocket:<url>` mark, saved like any cursor, and the gap-fill starts
+    no earlier than that second. scripts/check_websocket.py runs
+    it against a local stand-in server. Reconnects use full-jitter
+    exponential backoff. Event payloads are mapped like Gamma fills, with the
+    field mapper resolved from the first events received.
+    """
+    streaming = True
+
+    def __init__(self, url, gap_fill=None, subscribe=None):
+        super().__init__()
+        self.url = url
+        self.gap_fill = gap_fill
+        self.subscribe = subscribe
+        self._mapper = None
+        self._source = f'websocket:{url}'
+
+    async def start(self):
+        if self.gap_fill is not None:
+            self.gap_fill.store = self.store
+            await self.gap_fill.start()
+
+    def _backoff(self, attempt):
+        cap = min(settings.POLY_WS_RECONNECT_MAX_SECONDS, settings.POLY_WS_RECONNECT_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _map_message(self, raw):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
             return []
-        async with aiohttp.ClientSession() as session:
+        # Accept a bare event, a list of events, or {"data"/"trades": [...]}
+        if isinstance(payload, dict):
+            payload = payload.get('data') or payload.get('trades') or payload
+        events = payload if isinstance(payload, list) else [payload]
+        events = [e for e in events if isinstance(e, dict)]
+        if not events:
+            return []
+        if self._mapper is None or 'tx_hash' not in self._mapper.paths:
+            self._mapper = TradeMapper.discover(events)
+        admits = self.market_filter.admits_item
+        mapped = []
+        for item in events:
+            if not admits(self._mapper, item):
+                continue
+            t = self._mapper(item)
+            if t.tx_hash:
+                mapped.append(t)
+        return mapped
+
+    async def _last_pushed(self):
+        """The saved (timestamp, '') of the newest pushed trade, or None before any."""
+        if self._source not in self._cursors:
+            saved = await self.store.get_cursor(self._source) if self.store else None
+            if saved is None:
+                return None
+            self._cursors[self._source] = (int(saved[0]), saved[1] or '')
+        return self._cursors[self._source]
+
+    async def _pushed(self, trades):
+        newest = max(t.timestamp for t in trades)
+        mark = self._cursors.get(self._source)
+        if mark is None or newest > mark[0]:
+            await self.set_cursor(self._source, newest, '')
+
+    async def _fill_gap(self):
+        if self.gap_fill is None:
+            return []
+        try:
+            # Everything before the last pushed second was delivered: don't page through it again
+            mark = await self._last_pushed()
+            if mark is not None:
+                await self.gap_fill.skip_to(mark[0])
+            return await self.gap_fill.fetch_recent_trades() or []
+        except Exception as e:
+            log.warning('Error gap-filling after reconnect: %s', e)
+            return []
+
+    async def stream(self):
+        attempt = 0
+        while True:
+            session = await self.get_session()
+            try:
+                async with session.ws_connect(self.url, heartbeat=settings.POLY_WS_HEARTBEAT_SECONDS) as ws:
+                    if self.subscribe:
+                        await ws.send_str(self.subscribe)
+                    self.last_error = None
+                    # Connected first, then backfill: anything newer is already buffered on the socket
+                    missed = await self._fill_gap()
+                    if missed:
+                        yield missed
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            attempt = 0
+                            trades = self._map_message(msg.data)
+                            if trades:
+                                await self._pushed(trades)
+                                yield trades
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+                    self.last_error = 'WebSocket closed'
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning('WebSocket error: %s', e)
+                self.last_error = str(e)
+            delay = self._backoff(attempt)
+            attempt += 1
+            log.info('WebSocket disconnected; reconnecting in %.1fs', delay)
+            await asyncio.sleep(delay)
+
+    def take_cursors(self):
+        # The gap-fill adapter's cursors cover the trades stream() yielded from it
+        cursors = super().take_cursors()
+        if self.gap_fill is not None:
+            cursors.update(self.gap_fill.take_cursors())
+        return cursors
+
+    async def iter_trades(self):
+        # Polling fallback (e.g. scripts/run_once.py): ask the gap-fill adapter
+        if self.gap_fill is None:
+            return
+        async for t in self.gap_fill.iter_trades():
+            yield t
+
+    async def close(self):
+        if self.gap_fill is not None:
+            await self.gap_fill.close()
+        await super().close()
+
+
+class CompositeAdapter(BaseAdapter):
+    """Runs several adapters concurrently, each on its own cadence, and merges them.
+
+    Every child polls in its own task and appends to a shared buffer, so a
+    slow or failing source never holds back the others. `iter_trades`
+    drains the buffer into one timestamp-ordered stream, deduplicated by
+    tx_hash across sources and polls. Streaming children (WebSocketAdapter)
+    are consumed through `stream()` instead, buffering each pushed batch as
+    it arrives. Children's cursor moves wait in the
+    buffer with their trades and are only handed on (see take_cursors) once
+    those trades have been drained. The buffer holds up to
+    POLY_COMPOSITE_BUFFER_SIZE trades; children pause while it is full.
+    Per-source health (last success, error, fetch duration, lag behind the
+    newest trade) is kept in `health` and exported as metrics.
+    """
+    def __init__(self, sources):
+        super().__init__()
+        # sources: list of (name, adapter, interval_seconds)
+        self.sources = sources
+        self.health = {
+            name: {'last_success': None, 'last_error': None, 'consecutive_errors': 0,
+                   'last_duration': None, 'last_count': 0, 'newest_timestamp': None, 'lag_seconds': None}
+            for name, _adapter, _interval in sources
+        }
+        self._buffer = []
+        # Children's cursor moves covering trades in _buffer
+        self._buffer_cursors = {}
+        self._drained = asyncio.Event()
+        self._seen = {}
+        self._tasks = []
+        self._first_round = None
+
+    async def start(self):
+        if self._tasks:
+            return
+        pending = {name for name, _adapter, _interval in self.sources}
+        self._first_round = (asyncio.Event(), pending)
+        if not pending:
+            self._first_round[0].set()
+        for name, adapter, interval in self.sources:
+            adapter.store = self.store
+            await adapter.start()
+            self._tasks.append(asyncio.ensure_future(self._poll(name, adapter, interval)))
+
+    def _round_done(self, name):
+        event, pending = self._first_round
+        pending.discard(name)
+        if not pending:
+            event.set()
+
+    async def _buffer_trade(self, name, adapter, t):
+        while len(self._buffer) >= settings.POLY_COMPOSITE_BUFFER_SIZE:
+            # Backpressure: wait for the next poll to drain (counts as this source's first round)
+            self._round_done(name)
+            self._drained.clear()
+            await self._drained.wait()
+        self._buffer.append(t)
+        # Moves taken now only cover trades already buffered
+        self._buffer_cursors.update(adapter.take_cursors())
+
+    def _record(self, name, trades, error, duration):
+        health = self.health[name]
+        now = time.time()
+        health['last_duration'] = duration
+        health['last_count'] = len(trades)
+        if error:
+            health['last_error'] = error
+            health['consecutive_errors'] += 1
+            if health['consecutive_errors'] == 1:
+                log.warning('Source %s failing: %s', name, error, extra={'source': name})
+        else:
+            if health['consecutive_errors']:
+                log.info('Source %s recovered after %d failed fetch(es)', name, health['consecutive_errors'], extra={'source': name})
+            health['last_error'] = None
+            health['consecutive_errors'] = 0
+            health['last_success'] = now
+            SOURCE_LAST_SUCCESS.set(now, source=name)
+        SOURCE_FETCHES.inc(source=name, outcome='error' if error else 'ok')
+        SOURCE_CONSECUTIVE_ERRORS.set(health['consecutive_errors'], source=name)
+        newest = max((t.timestamp for t in trades), default=None)
+        if newest and (health['newest_timestamp'] is None or newest > health['newest_timestamp']):
+            health['newest_timestamp'] = newest
+        if health['newest_timestamp'] is not None:
+            health['lag_seconds'] = now - health['newest_timestamp']
+            SOURCE_LAG.set(health['lag_seconds'], source=name)
+
+    async def _poll(self, name, adapter, interval):
+        if adapter.streaming:
+            return await self._consume(name, adapter)
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            trades = []
             try:
-                async with session.post(self.url, json={'query': custom}, timeout=10) as resp:
-                    data = await resp.json()
-                    # Attempt to extract list similarly
-                    root = data.get('data') or {}
-                    for v in root.values():
-                        if isinstance(v, list):
-                            # Map with basic mapping
-                            mapped = []
-                            for item in v:
-                                mapped.append({
-                                    'tx_hash': item.get('txHash') or item.get('id'),
-                                    'wallet': item.get('trader') or item.get('wallet'),
-                                    'market_id': (item.get('market') or {}).get('id'),
-                                    'market_name': (item.get('market') or {}).get('title'),
-                                    'amount_usdc': item.get('amountUsd') or item.get('amount') or 0,
-                                    'timestamp': item.get('createdAt') or item.get('timestamp')
-                                })
-                            return mapped
+                # Buffer pages as the child yields them, not after its whole fetch
+                async for t in adapter.iter_trades():
+                    trades.append(t)
+                    await self._buffer_trade(name, adapter, t)
+                error = adapter.last_error
             except Exception as e:
-                print('Error fetching trades from graphql adapter', e)
-                return []
+                log.warning('Error fetching trades from source %s: %s', name, e, extra={'source': name})
+                error = str(e)
+            self._buffer_cursors.update(adapter.take_cursors())
+            SOURCE_BUFFERED.set(len(self._buffer))
+            self._record(name, trades, error, loop.time() - started)
+
+            self._round_done(name)
+            await asyncio.sleep(max(0.0, started + interval - loop.time()))
+
+    async def _consume(self, name, adapter):
+        """Buffer a push source's batches as they arrive (its interval is unused)."""
+        loop = asyncio.get_running_loop()
+        # Pushes come whenever they come: don't hold up the first drain for them
+        self._round_done(name)
+        started = loop.time()
+        async for trades in adapter.stream():
+            for t in trades:
+                await self._buffer_trade(name, adapter, t)
+            self._buffer_cursors.update(adapter.take_cursors())
+            SOURCE_BUFFERED.set(len(self._buffer))
+            self._record(name, trades, None, loop.time() - started)
+            started = loop.time()
+
+    async def iter_trades(self):
+        if not self._tasks:
+            # Used without Monitor.start() (e.g. scripts): wait for one round of every source
+            await self.start()
+            await self._first_round[0].wait()
+        batch, self._buffer = self._buffer, []
+        cursors, self._buffer_cursors = self._buffer_cursors, {}
+        self._drained.set()
+        SOURCE_BUFFERED.set(0)
+        merged = []
+        for t in batch:
+            tx = t.tx_hash
+            if not tx or tx in self._seen:
+                continue
+            self._seen[tx] = True
+            merged.append(t)
+        # Bounded cross-poll dedup memory (dicts keep insertion order: drop the oldest)
+        overflow = len(self._seen) - settings.POLY_COMPOSITE_DEDUP_SIZE
+        if overflow > 0:
+            for tx in list(self._seen)[:overflow]:
+                del self._seen[tx]
+        merged.sort(key=lambda t: t.timestamp)
+        # Only report an upstream failure when every source is failing
+        failing = [h['last_error'] for h in self.health.values() if h['last_error']]
+        self.last_error = failing[0] if self.health and len(failing) == len(self.health) else None
+        for t in merged:
+            yield t
+        # Handed on with the last chunk of this poll, which carries the trades they cover
+        for source, (timestamp, last_id) in cursors.items():
+            await self.set_cursor(source, timestamp, last_id)
+
+    async def close(self):
+        # Still-buffered trades are dropped with their cursor moves: they are fetched again
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for _name, adapter, _interval in self.sources:
+            await adapter.close()
+        await super().close()
+
+
+def _build_source(t):
+    """Build one adapter by explicit type for POLY_SOURCES (no fallbacks)."""
+    if t == 'rest' and settings.POLY_SOURCE_URL:
+        return RestAdapter(settings.POLY_SOURCE_URL)
+    if t in ('graphql', 'gamma') and settings.POLY_SOURCE_URL:
+        return PolymarketGammaAdapter(settings.POLY_SOURCE_URL)
+    if t in ('thegraph', 'subgraph') and settings.POLY_SUBGRAPH_URL:
+        return TheGraphAdapter(settings.POLY_SUBGRAPH_URL)
+    if t in ('websocket', 'ws') and settings.POLY_WS_URL:
+        return _build_websocket()
+    if t == 'mock':
+        return MockAdapter()
+    log.warning('Skipping source %r: unknown type or URL not configured', t)
+    return None
+
+
+def _build_websocket():
+    gap_type = (settings.POLY_WS_GAPFILL_TYPE or '').strip().lower()
+    gap_fill = _build_source(gap_type) if gap_type else None
+    return WebSocketAdapter(settings.POLY_WS_URL, gap_fill=gap_fill, subscribe=settings.POLY_WS_SUBSCRIBE or None)
+
+
+def _source_intervals():
+    intervals = {}
+    for part in (settings.POLY_SOURCE_INTERVALS or '').split(','):
+        if '=' in part:
+            k, v = part.split('=', 1)
+            try:
+                intervals[k.strip().lower()] = float(v)
+            except ValueError:
+                pass
+    return intervals
 
 
 def get_adapter():
+    # Several sources at once: POLY_SOURCES=graphql,thegraph
+    types = [t.strip().lower() for t in (settings.POLY_SOURCES or '').split(',') if t.strip()]
+    if types:
+        intervals = _source_intervals()
+        sources = []
+        for t in dict.fromkeys(types):
+            adapter = _build_source(t)
+            if adapter is not None:
+                sources.append((t, adapter, intervals.get(t, settings.POLL_INTERVAL_SECONDS)))
+        return CompositeAdapter(sources)
+
     t = settings.POLY_SOURCE_TYPE.lower()
     url = settings.POLY_SOURCE_URL
+    if t in ('websocket', 'ws') and settings.POLY_WS_URL:
+        return _build_websocket()
     if t == 'rest' and url:
         return RestAdapter(url)
     if t == 'graphql' and url:
@@ -1,14 +1,19 @@
+import asyncio
+import logging
 import smtplib
+import time
 from email.message import EmailMessage
 from .config import settings
+from .metrics import ALERT_SEND_SECONDS, ALERTS
+
+log = logging.getLogger(__name__)
 
 SUBJECT_PREFIX = "Polymarket异常警报"
 
-def send_alert_email(wallet, amount_usdc, market_name, trigger_reason):
-    if not settings.SMTP_HOST or not settings.ALERT_RECIPIENT:
-        print("SMTP or recipient not configured; skipping email")
-        return
+def _smtp_configured():
+    return bool(settings.SMTP_HOST and settings.ALERT_RECIPIENT)
 
+def _build_message(wallet, amount_usdc, market_name, trigger_reason):
     msg = EmailMessage()
     msg["From"] = settings.SMTP_USER
     msg["To"] = settings.ALERT_RECIPIENT
@@ -16,10 +21,216 @@ def send_alert_email(wallet, amount_usdc, market_name, trigger_reason):
 
     body = f"钱包: {wallet}\n金额(USDC): {amount_usdc}\n市场: {market_name}\n触发原因: {trigger_reason}\n"
     msg.set_content(body)
+    return msg
+
+def _build_digest(alerts):
+    msg = EmailMessage()
+    msg["From"] = settings.SMTP_USER
+    msg["To"] = settings.ALERT_RECIPIENT
+    msg["Subject"] = f"{SUBJECT_PREFIX} — {len(alerts)} 条告警汇总"
+
+    sections = []
+    for wallet, amount_usdc, market_name, trigger_reason in alerts:
+        sections.append(f"钱包: {wallet}\n金额(USDC): {amount_usdc}\n市场: {market_name}\n触发原因: {trigger_reason}\n")
+    msg.set_content("\n".join(sections))
+    return msg
+
+def _smtp_connect():
+    s = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+    s.starttls()
+    if settings.SMTP_USER and settings.SMTP_PASSWORD:
+        s.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+    return s
 
-    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as s:
-        s.starttls()
-        if settings.SMTP_USER and settings.SMTP_PASSWORD:
-            s.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+def send_alert_email(wallet, amount_usdc, market_name, trigger_reason):
+    """Send one alert synchronously over a fresh connection (used by scripts)."""
+    if not _smtp_configured():
+        log.info("SMTP or recipient not configured; skipping email")
+        return
+
+    msg = _build_message(wallet, amount_usdc, market_name, trigger_reason)
+    with _smtp_connect() as s:
         s.send_message(msg)
-        print(f"Alert sent for {wallet} — {trigger_reason}")
+        log.info("Alert sent for %s — %s", wallet, trigger_reason)
+
+
+class AlertState:
+    """Cooldown bookkeeping keyed by (signal, wallet, market).
+
+    `should_fire` returns False while the same key fired less than
+    ALERT_COOLDOWN_SECONDS ago, so a wallet that keeps trading (or a trade
+    that is seen again) does not produce a new email every poll. State is
+    persisted in the Store so restarts don't reset the cooldowns.
+    """
+    def __init__(self, store=None):
+        self.store = store
+        self._last_sent = {}
+
+    async def load(self):
+        if not self.store:
+            return
+        since = int(time.time()) - settings.ALERT_COOLDOWN_SECONDS
+        for signal, wallet, market_id, last_sent_at in await self.store.alert_states(since):
+            self._last_sent[(signal, wallet, market_id)] = last_sent_at
+
+    async def should_fire(self, signal, wallet, market_id, now=None):
+        now = int(now if now is not None else time.time())
+        key = (signal, wallet or '', market_id or '')
+        last = self._last_sent.get(key)
+        if last is not None and now - last < settings.ALERT_COOLDOWN_SECONDS:
+            return False
+        self._last_sent[key] = now
+        if self.store:
+            await self.store.set_alert_state(*key, now)
+        return True
+
+    def prune(self, now=None):
+        cutoff = int(now if now is not None else time.time()) - settings.ALERT_COOLDOWN_SECONDS
+        for key in [k for k, ts in self._last_sent.items() if ts < cutoff]:
+            del self._last_sent[key]
+
+
+class AlertDispatcher:
+    """Delivers alerts from an asyncio queue on a background task.
+
+    Alerts are written to the Store's outbox when enqueued and removed once
+    sent, so anything still pending at shutdown is re-queued by `start()`.
+    One authenticated SMTP session is kept open and re-established on
+    failure; failed sends are retried with exponential backoff, and alerts
+    still failing after ALERT_MAX_RETRIES go back on the queue every
+    ALERT_RETRY_MAX_SECONDS until they are sent.
+
+    With ALERT_DIGEST_MODE=cycle all alerts of one poll cycle are sent as a
+    single digest email; with `interval` they are coalesced for
+    ALERT_DIGEST_INTERVAL_SECONDS. Each queue item is a list of alerts.
+    """
+    def __init__(self, store=None):
+        self.store = store
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._smtp = None
+        self.digest_mode = (settings.ALERT_DIGEST_MODE or 'off').lower()
+        self._digest = []
+        self._digest_started = None
+        self._retry_timers = set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        if self.store:
+            for alert_id, wallet, amount, market_name, reason in await self.store.pending_alerts():
+                self._submit(alert_id, (wallet, amount, market_name, reason))
+        self._task = asyncio.ensure_future(self._run())
+
+    def _submit(self, alert_id, alert):
+        if self.digest_mode in ('cycle', 'interval'):
+            if not self._digest:
+                self._digest_started = time.monotonic()
+            self._digest.append((alert_id, alert))
+        else:
+            self._queue.put_nowait([(alert_id, alert)])
+
+    async def enqueue(self, wallet, amount_usdc, market_name, trigger_reason):
+        if not _smtp_configured():
+            log.info("SMTP or recipient not configured; skipping email")
+            return
+        alert = (wallet, amount_usdc, market_name, trigger_reason)
+        alert_id = await self.store.add_alert(*alert, int(time.time())) if self.store else None
+        self._submit(alert_id, alert)
+        ALERTS.inc(outcome='queued')
+
+    def end_cycle(self):
+        """Called once per poll cycle; hands a due digest to the sender."""
+        if not self._digest:
+            return
+        if self.digest_mode == 'interval' and time.monotonic() - self._digest_started < settings.ALERT_DIGEST_INTERVAL_SECONDS:
+            return
+        self._flush_digest()
+
+    def _flush_digest(self):
+        if self._digest:
+            self._queue.put_nowait(self._digest)
+            self._digest = []
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._flush_digest()
+        # Give queued alerts a moment to go out; the rest stay in the outbox
+        try:
+            await asyncio.wait_for(self._queue.join(), settings.ALERT_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            log.warning('%d alert(s) still pending; will retry on next start', self._queue.qsize())
+        for handle in self._retry_timers:
+            handle.cancel()
+        self._retry_timers.clear()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._disconnect)
+
+    async def _run(self):
+        while True:
+            batch = await self._queue.get()
+            try:
+                await self._deliver(batch)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, batch):
+        alerts = [alert for _alert_id, alert in batch]
+        ids = [alert_id for alert_id, _alert in batch if alert_id is not None]
+        msg = _build_message(*alerts[0]) if len(alerts) == 1 else _build_digest(alerts)
+        for attempt in range(settings.ALERT_MAX_RETRIES + 1):
+            try:
+                with ALERT_SEND_SECONDS.time():
+                    await asyncio.to_thread(self._send, msg)
+                ALERTS.inc(len(alerts), outcome='sent')
+                if len(alerts) == 1:
+                    log.info("Alert sent for %s — %s", alerts[0][0], alerts[0][3], extra={'wallet': alerts[0][0]})
+                else:
+                    log.info("Alert digest sent (%d alerts)", len(alerts))
+                if self.store and ids:
+                    await self.store.delete_alerts(ids)
+                return
+            except Exception as e:
+                log.warning('Error sending alert email: %s', e, extra={'attempt': attempt})
+                await asyncio.to_thread(self._disconnect)
+                if self.store and ids:
+                    await self.store.bump_alert_attempts(ids)
+                if attempt < settings.ALERT_MAX_RETRIES:
+                    delay = min(settings.ALERT_RETRY_BASE_SECONDS * (2 ** attempt), settings.ALERT_RETRY_MAX_SECONDS)
+                    await asyncio.sleep(delay)
+        ALERTS.inc(len(alerts), outcome='failed')
+        log.error('Could not send %d alert(s); kept in outbox, retrying in %.0fs', len(alerts), settings.ALERT_RETRY_MAX_SECONDS)
+        self._requeue_later(batch)
+
+    def _requeue_later(self, batch):
+        # Behind whatever was queued meanwhile, so one undeliverable batch doesn't block the rest
+        def requeue():
+            self._retry_timers.discard(handle)
+            self._queue.put_nowait(batch)
+        handle = asyncio.get_running_loop().call_later(settings.ALERT_RETRY_MAX_SECONDS, requeue)
+        self._retry_timers.add(handle)
+
+    def _send(self, msg):
+        if self._smtp is None:
+            self._smtp = _smtp_connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Idle session dropped by the server: reconnect once and resend
+            self._smtp = _smtp_connect()
+            self._smtp.send_message(msg)
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+
+class Backfill:
+    """Seeds the store with a source's history over [start, end).
+
+    Every stream the adapter exposes (`backfill_streams()`) is split into
+    time slices that are paged concurrently, up to `concurrency` at once.
+    Rows go through the store's insert buffer and are committed every
+    `commit_rows` together with each slice's checkpoint, kept in
+    source_cursors as `backfill:<source>:<stream>:<slice start>`; a rerun
+    with the same range skips finished slices and resumes the others from
+    their last committed page. On SQLite, read-side indexes are dropped for
+    the load and rebuilt at the end; a shared Postgres database keeps them,
+    since live monitors query it meanwhile.
+    """
+    def __init__(self, store, adapter, source, start, end, slice_seconds=None,
+                 concurrency=None, commit_rows=None, page_size=None):
+        self.store = store
+        self.adapter = adapter
+        self.source = source
+        self.start = int(start)
+        self.end = int(end)
+        self.slice_seconds = slice_seconds or settings.BACKFILL_SLICE_SECONDS
+        self.concurrency = concurrency or settings.BACKFILL_CONCURRENCY
+        self.commit_rows = commit_rows or settings.BACKFILL_COMMIT_ROWS
+        self.page_size = page_size or settings.BACKFILL_PAGE_SIZE
+        self.adapter.store = store
+        self.rows = 0
+        self.failed_slices = 0
+        self._buffered = 0
+        self._commit_lock = asyncio.Lock()
+        self._started = None
+
+    def _slices(self):
+        for stream in self.adapter.backfill_streams():
+            lo = self.start
+            while lo < self.end:
+                hi = min(lo + self.slice_seconds, self.end)
+                yield stream, lo, hi
+                lo = hi
+
+    def _checkpoint(self, stream, lo):
+        return f'backfill:{self.source}:{stream}:{lo}'
+
+    async def _commit(self):
+        async with self._commit_lock:
+            await self.store.flush()
+            self._buffered = 0
+            elapsed = max(time.monotonic() - self._started, 1e-6)
+            log.info('Backfill %s: %d rows, %.0f rows/s', self.source, self.rows, self.rows / elapsed)
+
+    async def _page(self, stream, cursor, hi):
+        # A few retries with backoff per page; the slice stays resumable either way
+        for attempt in range(3):
+            try:
+                return await self.adapter.fetch_range(stream, cursor, hi, self.page_size)
+            except Exception as e:
+                if attempt == 2:
+                    raise
+                log.warning('Backfill page error on %s, retrying: %s', stream, e)
+                await asyncio.sleep(2 ** attempt)
+
+    async def _run_slice(self, stream, lo, hi):
+        key = self._checkpoint(stream, lo)
+        saved = await self.store.get_cursor(key)
+        # (lo, '') sorts before every item at `lo`, so the slice starts inclusive
+        cursor = (int(saved[0]), saved[1] or '') if saved else (lo, '')
+        # A finished slice is checkpointed at its upper bound
+        if cursor[0] >= hi:
+            return
+        while cursor is not None:
+            trades, next_cursor = await self._page(stream, cursor, hi)
+            await self.store.add_trades(
+                (t.tx_hash, t.wallet, t.market_id, t.market_name, t.amount_usdc, t.timestamp)
+                for t in trades if t.tx_hash
+            )
+            self.rows += len(trades)
+            self._buffered += len(trades)
+            cursor = next_cursor
+            # Lands in the same transaction as the rows above
+            await self.store.set_cursor(key, *(cursor or (hi, '')))
+            if self._buffered >= self.commit_rows:
+                await self._commit()
+
+    async def _worker(self, queue):
+        while True:
+            try:
+                stream, lo, hi = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await self._run_slice(stream, lo, hi)
+            except Exception as e:
+                self.failed_slices += 1
+                log.error('Backfill slice %s [%d, %d) failed; rerun to resume: %s', stream, lo, hi, e)
+
+    async def run(self):
+        """Load the whole range; returns (rows, rows per second)."""
+        await self.store.init()
+        queue = asyncio.Queue()
+        for item in self._slices():
+            queue.put_nowait(item)
+        if queue.empty():
+            log.error('Source %r does not support backfill', self.source)
+            return 0, 0.0
+        self._started = time.monotonic()
+        await self.store.drop_secondary_indexes()
+        try:
+            await asyncio.gather(*(self._worker(queue) for _ in range(self.concurrency)))
+            await self._commit()
+        finally:
+            log.info('Rebuilding trade indexes...')
+            await self.store.create_secondary_indexes()
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        rate = self.rows / elapsed
+        log.info('Backfill %s done: %d rows in %.1fs (%.0f rows/s), %d slice(s) failed',
+                 self.source, self.rows, elapsed, rate, self.failed_slices)
+        return self.rows, rate
@@ -1,25 +1,41 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+import aiohttp
 import requests
 from .config import settings
+from .metrics import WALLET_AGE
+from .upstream import UpstreamClient, UpstreamError
 from datetime import datetime
 
+log = logging.getLogger(__name__)
 
-def get_wallet_first_tx_timestamp(wallet_address):
-    """Use Etherscan API to get first transaction timestamp for the address.
-    Returns unix timestamp (int) or None if unknown.
-    """
-    if not settings.ETHERSCAN_API_KEY:
-        return None
-    params = {
+
+def _first_tx_params(wallet_address):
+    # Ascending order with a page size of 1: Etherscan returns just the first tx
+    return {
         'module': 'account',
         'action': 'txlist',
         'address': wallet_address,
         'startblock': 0,
         'endblock': 99999999,
+        'page': 1,
+        'offset': 1,
         'sort': 'asc',
         'apikey': settings.ETHERSCAN_API_KEY
     }
+
+
+def get_wallet_first_tx_timestamp(wallet_address):
+    """Use Etherscan API to get first transaction timestamp for the address.
+    Returns unix timestamp (int) or None if unknown.
+    Blocking; the monitor itself uses WalletAgeService.
+    """
+    if not settings.ETHERSCAN_API_KEY:
+        return None
     try:
-        r = requests.get(settings.ETHERSCAN_API_URL, params=params, timeout=10)
+        r = requests.get(settings.ETHERSCAN_API_URL, params=_first_tx_params(wallet_address), timeout=10)
         r.raise_for_status()
         data = r.json()
         if data.get('status') == '1' and data.get('result'):
@@ -27,7 +43,7 @@ def get_wallet_first_tx_timestamp(wallet_address):
             ts = int(first['timeStamp'])
             return ts
     except Exception as e:
-        print('Error fetching Etherscan data', e)
+        log.warning('Error fetching Etherscan data: %s', e)
     return None
 
 
@@ -37,3 +53,138 @@ def is_wallet_new(wallet_address, within_seconds=24*3600):
         return False
     now = int(datetime.utcnow().timestamp())
     return (now - ts) < within_seconds
+
+
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second, bursting to `capacity`."""
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError(f'TokenBucket rate must be positive, got {rate}')
+        self.rate = float(rate)
+        # Below 1/s a capacity equal to the rate could never hold a whole token
+        self.capacity = max(1.0, float(capacity or rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class WalletAgeService:
+    """Non-blocking wallet first-transaction lookups.
+
+    Known first-tx timestamps never change, so they are kept forever in the
+    Store, with the most recently used WALLET_AGE_CACHE_SIZE wallets also in
+    an in-memory LRU. "No transactions" answers are cached for
+    ETHERSCAN_NEGATIVE_TTL_SECONDS. Concurrent lookups of the same wallet
+    share one request, and all requests go through a token bucket sized to
+    the Etherscan rate limit, including retries of rate-limited answers
+    (see UpstreamClient).
+    """
+    def __init__(self, store=None, rate_per_sec=None):
+        self.store = store
+        self.max_entries = settings.WALLET_AGE_CACHE_SIZE
+        # wallet -> (first tx timestamp or None, checked_at), least recently used first
+        self._cache = OrderedDict()
+        self._inflight = {}
+        # Sharded workers each get a slice of the shared Etherscan budget
+        self._limiter = TokenBucket(rate_per_sec or settings.ETHERSCAN_RATE_LIMIT_PER_SEC)
+        self.upstream = UpstreamClient('etherscan')
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _remember(self, wallet, entry):
+        self._cache[wallet] = entry
+        self._cache.move_to_end(wallet)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _fresh(self, entry):
+        ts, checked_at = entry
+        return ts is not None or time.time() - checked_at < settings.ETHERSCAN_NEGATIVE_TTL_SECONDS
+
+    async def first_tx_timestamp(self, wallet_address):
+        """Return the wallet's first tx unix timestamp, or None if unknown."""
+        if not settings.ETHERSCAN_API_KEY or not wallet_address:
+            return None
+        wallet = wallet_address.lower()
+        entry = self._cache.get(wallet)
+        source = 'cache'
+        if entry is not None:
+            self._cache.move_to_end(wallet)
+        elif self.store:
+            entry = await self.store.get_wallet_first_tx(wallet)
+            source = 'store'
+            if entry is not None:
+                self._remember(wallet, entry)
+        if entry is not None and self._fresh(entry):
+            WALLET_AGE.inc(source=source)
+            return entry[0]
+
+        task = self._inflight.get(wallet)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(wallet))
+            self._inflight[wallet] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(wallet, None))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _answered(status, data):
+        # "Max rate limit reached" comes back as HTTP 200 with status 0: retry it
+        return status < 400 and isinstance(data, dict) and 'rate limit' not in str(data.get('result')).lower()
+
+    async def _lookup(self, wallet):
+        WALLET_AGE.inc(source='etherscan')
+        session = await self._get_session()
+        try:
+            _endpoint, _status, data = await self.upstream.request(
+                session, 'GET', [settings.ETHERSCAN_API_URL], accept=self._answered,
+                throttle=self._limiter.acquire, params=_first_tx_params(wallet),
+            )
+        except UpstreamError as e:
+            log.warning('Error fetching Etherscan data: %s', e)
+            return None
+
+        result = data.get('result')
+        if data.get('status') == '1' and result:
+            ts = int(result[0]['timeStamp'])
+        elif isinstance(result, list):
+            # status 0 with an empty list: "No transactions found"
+            ts = None
+        else:
+            # Rate limited / invalid key etc. -- don't cache
+            log.warning('Etherscan error: %s %s', data.get('message'), result)
+            return None
+
+        entry = (ts, int(time.time()))
+        self._remember(wallet, entry)
+        await self._save(wallet, ts, entry[1])
+        return ts
+
+    async def _save(self, wallet, ts, checked_at):
+        if self.store:
+            await self.store.set_wallet_first_tx(wallet, ts, checked_at)
+
+    async def is_wallet_new(self, wallet_address, within_seconds=24*3600):
+        ts = await self.first_tx_timestamp(wallet_address)
+        if ts is None:
+            return False
+        return (time.time() - ts) < within_seconds
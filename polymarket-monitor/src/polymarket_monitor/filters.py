@@ -0,0 +1,122 @@
+import re
+from .config import settings
+
+try:
+    import ahocorasick
+except ImportError:  # optional: faster matching for very large keyword lists
+    ahocorasick = None
+
+
+def _split(value):
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+
+class KeywordMatcher:
+    """Case-insensitive substring match against many keywords in one pass.
+
+    The keywords are compiled once: into an Aho-Corasick automaton when
+    pyahocorasick is installed, otherwise into a single alternation regex
+    (longest first). Either way a search costs one scan of the text instead
+    of one `in` test per keyword.
+    """
+    def __init__(self, keywords):
+        self.keywords = sorted({k.strip().lower() for k in keywords if k and k.strip()}, key=len, reverse=True)
+        self._automaton = None
+        self._pattern = None
+        if not self.keywords:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        else:
+            self._pattern = re.compile('|'.join(map(re.escape, self.keywords)), re.IGNORECASE)
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def search(self, *texts):
+        """True if any keyword occurs in any of the texts."""
+        for text in texts:
+            if not text:
+                continue
+            if self._automaton is not None:
+                if next(self._automaton.iter(str(text).lower()), None) is not None:
+                    return True
+            elif self._pattern is not None and self._pattern.search(str(text)):
+                return True
+        return False
+
+
+class MarketFilter:
+    """Decides which markets' trades an adapter keeps; one instance is shared by all adapters.
+
+    - `market_ids` (POLY_MARKET_IDS): always kept
+    - `exclude` (POLY_MARKET_EXCLUDE_KEYWORDS): dropped when the name or a tag matches
+    - `include` (POLY_MARKET_KEYWORDS): when set, only matching markets are kept
+
+    With only an allowlist, only the listed markets are kept. A market with
+    no usable name (missing, or a raw 0x id) can't be judged by keywords and
+    is kept. Adapters call `admits_item` on the raw item, before mapping it;
+    decisions are memoized per market, so keywords are matched once per
+    market rather than once per trade.
+    """
+    MAX_DECISIONS = 50000
+
+    def __init__(self, include=(), exclude=(), market_ids=()):
+        self.include = KeywordMatcher(include)
+        self.exclude = KeywordMatcher(exclude)
+        self.market_ids = frozenset(str(m).strip().lower() for m in market_ids if m and str(m).strip())
+        self._decisions = {}
+
+    def __bool__(self):
+        return bool(self.include or self.exclude or self.market_ids)
+
+    def admits(self, market_id, name, tags=()):
+        """True if trades in this market should be kept."""
+        if not self:
+            return True
+        key = (market_id, name, tags)
+        decision = self._decisions.get(key)
+        if decision is None:
+            decision = self._decide(market_id, name, tags)
+            if len(self._decisions) >= self.MAX_DECISIONS:
+                self._decisions.clear()
+            self._decisions[key] = decision
+        return decision
+
+    def admits_item(self, mapper, item):
+        """`admits` for a raw item, reading only its market fields through `mapper`."""
+        market_id, name = mapper.market(item)
+        return self.admits(market_id, name)
+
+    def _decide(self, market_id, name, tags):
+        if market_id is not None and str(market_id).lower() in self.market_ids:
+            return True
+        name = str(name) if name is not None else ''
+        named = bool(name) and not name.startswith('0x')
+        if not named:
+            name = ''
+        known = named or bool(tags)
+        if known and self.exclude.search(name, *tags):
+            return False
+        if self.include:
+            return not known or self.include.search(name, *tags)
+        # Allowlist without keywords: nothing else gets through
+        return not self.market_ids
+
+
+_shared = None
+
+
+def get_market_filter():
+    """The process-wide MarketFilter, compiled from settings on first use."""
+    global _shared
+    if _shared is None:
+        _shared = MarketFilter(
+            include=_split(settings.POLY_MARKET_KEYWORDS),
+            exclude=_split(settings.POLY_MARKET_EXCLUDE_KEYWORDS),
+            market_ids=_split(settings.POLY_MARKET_IDS),
+        )
+    return _shared
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+
+class StoreMaintenance:
+    """Keeps the store's size and query latency flat on a background task.
+
+    Every MAINTENANCE_INTERVAL_SECONDS it deletes raw trades past
+    TRADE_RETENTION_SECONDS and hourly rollups past ROLLUP_RETENTION_SECONDS,
+    returns freed pages with an incremental vacuum and refreshes planner
+    statistics. Raw trades are never purged inside the 24h signal window;
+    per-wallet history lives on in the compact `wallets` table. Databases
+    created before incremental auto-vacuum are not converted here (that is
+    a full VACUUM): see scripts/enable_incremental_vacuum.py.
+    """
+    # The activity index warms up from the last 24h of raw trades
+    MIN_RETENTION_SECONDS = 24 * 3600
+
+    def __init__(self, store):
+        self.store = store
+        self._task = None
+        self._vacuum_hinted = False
+
+    async def start(self):
+        if self._task is not None or settings.MAINTENANCE_INTERVAL_SECONDS <= 0:
+            return
+        self._task = asyncio.ensure_future(self._run())
+
+    async def run_once(self, now=None):
+        now = int(now if now is not None else time.time())
+        started = time.monotonic()
+        if not self._vacuum_hinted and not await self.store.incremental_vacuum_enabled():
+            self._vacuum_hinted = True
+            log.warning('Store is not in incremental auto-vacuum mode, so purged space is not returned to the OS; '
+                        'stop the monitor and run scripts/enable_incremental_vacuum.py once')
+        retention = max(settings.TRADE_RETENTION_SECONDS, self.MIN_RETENTION_SECONDS)
+        trades = await self.store.purge_trades(now - retention)
+        rollups = 0
+        if settings.ROLLUP_RETENTION_SECONDS > 0:
+            rollups = await self.store.purge_rollups(now - settings.ROLLUP_RETENTION_SECONDS)
+        await self.store.compact(settings.VACUUM_PAGES_PER_RUN)
+        size, free = await self.store.database_size()
+        log.info('Store maintenance: purged %d trade(s), %d rollup(s); %.1f MB (%.1f MB free) in %.1fs',
+                 trades, rollups, size / 1e6, free / 1e6, time.monotonic() - started)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                log.error('Error during store maintenance: %s', e)
+            await asyncio.sleep(settings.MAINTENANCE_INTERVAL_SECONDS)
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
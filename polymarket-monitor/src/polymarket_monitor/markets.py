@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from .config import settings
+from .upstream import UpstreamClient, UpstreamError
+
+log = logging.getLogger(__name__)
+
+
+class MarketResolver:
+    """Resolves subgraph condition ids to market titles and tags.
+
+    Lookups go through an in-memory LRU, then the Store's market_metadata
+    table, and only then to the Gamma markets endpoint, batched
+    MARKET_RESOLVE_BATCH ids per request. Entries are refreshed after
+    MARKET_CACHE_TTL_SECONDS; ids Gamma doesn't know are remembered for
+    MARKET_NEGATIVE_TTL_SECONDS so they aren't asked for on every poll.
+    The lookup is by `condition_ids`, so negRisk market ids can't be
+    resolved here (TheGraphAdapter doesn't pass them in).
+    """
+    def __init__(self, url=None, max_entries=None):
+        self.url = url or settings.POLY_GAMMA_MARKETS_URL
+        self.max_entries = max_entries or settings.MARKET_CACHE_SIZE
+        # market_id -> (title or None, tags tuple, fetched_at)
+        self._cache = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.upstream = UpstreamClient('gamma-markets')
+
+    def _fresh(self, entry, now):
+        title, _tags, fetched_at = entry
+        ttl = settings.MARKET_CACHE_TTL_SECONDS if title else settings.MARKET_NEGATIVE_TTL_SECONDS
+        return now - fetched_at < ttl
+
+    def _remember(self, market_id, entry):
+        self._cache[market_id] = entry
+        self._cache.move_to_end(market_id)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def resolve(self, market_ids, session, store=None):
+        """Return {market_id: (title, tags)} for the ids that could be resolved."""
+        now = int(time.time())
+        ids = {m for m in market_ids if m}
+        result = {}
+        missing = []
+        for market_id in ids:
+            entry = self._cache.get(market_id)
+            if entry is not None and self._fresh(entry, now):
+                self._cache.move_to_end(market_id)
+                if entry[0]:
+                    result[market_id] = entry[:2]
+            else:
+                missing.append(market_id)
+        if not missing:
+            return result
+
+        # One resolver per adapter, but polls may overlap: don't fetch the same ids twice
+        async with self._lock:
+            if store:
+                for market_id, entry in (await store.get_markets(missing)).items():
+                    self._remember(market_id, entry)
+            stale = []
+            for market_id in missing:
+                entry = self._cache.get(market_id)
+                if entry is not None and self._fresh(entry, now):
+                    if entry[0]:
+                        result[market_id] = entry[:2]
+                else:
+                    stale.append(market_id)
+            if stale:
+                fetched = await self._fetch(stale, session)
+                if fetched is not None:
+                    rows = []
+                    for market_id in stale:
+                        title, tags = fetched.get(market_id, (None, ()))
+                        entry = (title, tags, now)
+                        self._remember(market_id, entry)
+                        rows.append((market_id, title, tags, now))
+                        if title:
+                            result[market_id] = (title, tags)
+                    if store:
+                        await store.set_markets(rows)
+                else:
+                    # Gamma unavailable: fall back to whatever we had, however old
+                    for market_id in stale:
+                        entry = self._cache.get(market_id)
+                        if entry is not None and entry[0]:
+                            result[market_id] = entry[:2]
+        return result
+
+    async def _fetch(self, market_ids, session):
+        """Query Gamma in batches; returns {id: (title, tags)}, or None if every batch failed."""
+        size = max(1, settings.MARKET_RESOLVE_BATCH)
+        batches = [market_ids[i:i + size] for i in range(0, len(market_ids), size)]
+        answers = await asyncio.gather(*(self._fetch_batch(b, session) for b in batches))
+        if all(a is None for a in answers):
+            return None
+        wanted = {m.lower(): m for m in market_ids}
+        resolved = {}
+        for markets in answers:
+            for market in markets or []:
+                title, tags = self._describe(market)
+                for key in ('conditionId', 'questionID', 'id'):
+                    original = wanted.get(str(market.get(key) or '').lower())
+                    if original and title:
+                        resolved.setdefault(original, (title, tags))
+        return resolved
+
+    async def _fetch_batch(self, market_ids, session):
+        params = [('condition_ids', m) for m in market_ids] + [('limit', str(len(market_ids)))]
+        try:
+            _endpoint, _status, data = await self.upstream.request(session, 'GET', [self.url], timeout=15, params=params)
+        except UpstreamError as e:
+            log.warning('Error resolving markets: %s', e)
+            return None
+        if isinstance(data, dict):
+            data = data.get('data') or data.get('markets') or []
+        return data if isinstance(data, list) else []
+
+    @staticmethod
+    def _describe(market):
+        title = market.get('question') or market.get('title')
+        tags = []
+        events = market.get('events') or []
+        for source in [market] + [e for e in events if isinstance(e, dict)]:
+            for tag in source.get('tags') or []:
+                label = tag.get('label') or tag.get('slug') if isinstance(tag, dict) else tag
+                if label and label not in tags:
+                    tags.append(label)
+        # negRisk groups are better known by their event title
+        if events and isinstance(events[0], dict) and events[0].get('title') and market.get('negRisk'):
+            title = f"{events[0]['title']}: {title}" if title else events[0]['title']
+        return title, tuple(tags)
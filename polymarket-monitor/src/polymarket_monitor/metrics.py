@@ -0,0 +1,273 @@
+import asyncio
+import bisect
+import functools
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+# Seconds; covers in-memory stages through slow upstream requests
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    # Full precision like the reference client: {:g} keeps 6 digits and flattens counters past 1e6
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """In-process metric in the Prometheus text format, keyed by label values.
+
+    Label values are passed as keyword arguments (`inc(endpoint=url)`);
+    missing labels are empty. Updates are plain dict operations on the event
+    loop's thread, cheap enough for per-batch use on the hot path.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name, doc, labels=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labels)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, '') for n in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Set directly, or computed at scrape time by `collect()` -> {label tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name, doc, labels=(), collect=None):
+        super().__init__(name, doc, labels)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def render(self):
+        if self.collect is not None:
+            try:
+                self._values = dict(self.collect())
+            except Exception as e:
+                log.warning('Error collecting metric %s: %s', self.name, e)
+        return super().render()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            entry[0][i] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} {self.kind}']
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{bound:g}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [le])} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+def timed(histogram, **labels):
+    """Decorator timing a coroutine method into `histogram`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def inner(*args, **kwargs):
+            with histogram.time(**labels):
+                return await fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Poll loop
+POLL_SECONDS = Histogram('polymonitor_poll_duration_seconds', 'Time from poll start until all its trades are fetched')
+POLLS = Counter('polymonitor_polls_total', 'Polls by outcome (ok, error, skipped)', ['outcome'])
+TRADES_PER_POLL = Histogram('polymonitor_trades_per_poll', 'Trades fetched per poll', buckets=COUNT_BUCKETS)
+TRADES = Counter('polymonitor_trades_total', 'Trades by processing outcome (fetched, duplicate, seen, new)', ['outcome'])
+STAGE_SECONDS = Histogram('polymonitor_stage_seconds', 'Time spent per processing stage', ['stage'])
+LOOP_LAG = Histogram('polymonitor_event_loop_lag_seconds', 'Event loop scheduling delay',
+                     buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+
+# Sources merged by CompositeAdapter
+SOURCE_FETCHES = Counter('polymonitor_source_fetches_total', 'Fetches per source by outcome (ok, error)', ['source', 'outcome'])
+SOURCE_CONSECUTIVE_ERRORS = Gauge('polymonitor_source_consecutive_errors', 'Failed fetches in a row per source', ['source'])
+SOURCE_LAST_SUCCESS = Gauge('polymonitor_source_last_success_timestamp_seconds', 'Unix time of the last successful fetch per source', ['source'])
+SOURCE_LAG = Gauge('polymonitor_source_lag_seconds', 'Age of the newest trade seen from each source, as of its last fetch', ['source'])
+SOURCE_BUFFERED = Gauge('polymonitor_source_buffered_trades', 'Trades fetched by sources and not yet taken by a poll')
+
+# Upstreams (adapters, market lookups, Etherscan)
+UPSTREAM_SECONDS = Histogram('polymonitor_upstream_request_seconds', 'Upstream request latency per endpoint',
+                             ['upstream', 'endpoint', 'outcome'])
+UPSTREAM_RETRIES = Counter('polymonitor_upstream_retries_total', 'Extra upstream attempts (retry or hedge)', ['upstream', 'kind'])
+WALLET_AGE = Counter('polymonitor_wallet_age_lookups_total', 'Wallet-age lookups by source (cache, store, etherscan)', ['source'])
+
+# Storage
+STORE_SECONDS = Histogram('polymonitor_store_seconds', 'Store operation latency', ['backend', 'op'])
+
+# Alerts
+ALERTS = Counter('polymonitor_alerts_total', 'Alerts by outcome (suppressed, queued, sent, failed)', ['outcome'])
+ALERT_SEND_SECONDS = Histogram('polymonitor_alert_send_seconds', 'SMTP send latency per email')
+
+
+_trace_hooks = []
+
+
+def add_trace_hook(hook):
+    """Register `hook(stage, seconds, info)`, called after every traced stage."""
+    _trace_hooks.append(hook)
+
+
+@contextmanager
+def trace(stage, **info):
+    """Time one processing stage into STAGE_SECONDS and the trace hooks."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        for hook in _trace_hooks:
+            try:
+                hook(stage, elapsed, info)
+            except Exception as e:
+                log.warning('Error in trace hook: %s', e)
+
+
+def _log_slow_stage(stage, seconds, info):
+    if seconds >= settings.TRACE_SLOW_STAGE_SECONDS:
+        log.warning('Slow stage %s: %.3fs', stage, seconds, extra={'stage': stage, 'seconds': round(seconds, 4), **info})
+
+
+_hooks_installed = False
+
+
+def install_trace_hooks():
+    """Hooks from settings (once): slow-stage logging and an optional TRACE_HOOK ("module:function")."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+    if settings.TRACE_SLOW_STAGE_SECONDS > 0:
+        add_trace_hook(_log_slow_stage)
+    if settings.TRACE_HOOK:
+        module, _sep, attr = settings.TRACE_HOOK.partition(':')
+        try:
+            add_trace_hook(getattr(importlib.import_module(module), attr))
+        except (ImportError, AttributeError) as e:
+            log.error('Cannot load TRACE_HOOK %r: %s', settings.TRACE_HOOK, e)
+
+
+class MetricsServer:
+    """Serves `/metrics` on METRICS_HOST:METRICS_PORT (0 = off) and samples event loop lag."""
+    def __init__(self, host=None, port=None):
+        self.host = host or settings.METRICS_HOST
+        self.port = settings.METRICS_PORT if port is None else port
+        self._runner = None
+        self._lag_task = None
+
+    async def start(self):
+        install_trace_hooks()
+        if self._lag_task is None and settings.METRICS_LOOP_LAG_INTERVAL_SECONDS > 0:
+            self._lag_task = asyncio.ensure_future(self._sample_lag())
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info('Metrics at http://%s:%s/metrics', self.host, self.port)
+
+    async def _handle(self, request):
+        return web.Response(text=render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Prometheus-Format': '0.0.4'})
+
+    async def _sample_lag(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.METRICS_LOOP_LAG_INTERVAL_SECONDS
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+    async def close(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,63 +1,253 @@
 import asyncio
-import time
-from datetime import datetime
+import logging
 from .adapter import get_adapter
-from .store import Store
+from .store import get_store
+from .activity import ActivityIndex
 from .config import settings
-from .blockchain import is_wallet_new
-from .alerts import send_alert_email
+from .blockchain import WalletAgeService
+from .alerts import AlertDispatcher, AlertState
+from .maintenance import StoreMaintenance
+from .metrics import ALERTS, TRADES, MetricsServer, trace
+from .scheduler import AdaptiveInterval, PollScheduler
+from .signals import get_detectors
+from .trade import Trade
+
+log = logging.getLogger(__name__)
 
 class Monitor:
     def __init__(self):
         self.adapter = get_adapter()
-        self.store = Store(settings.SQLITE_PATH)
+        self.store = get_store()
+        self.adapter.store = self.store
+        self.activity = ActivityIndex()
+        self.wallet_age = WalletAgeService(self.store)
+        self.alerts = AlertDispatcher(self.store)
+        self.alert_state = AlertState(self.store)
+        self.maintenance = StoreMaintenance(self.store)
         self.poll_interval = settings.POLL_INTERVAL_SECONDS
         self.threshold = settings.ALERT_USDC_THRESHOLD
+        # Optional batch detectors scored after the fixed rules (SIGNAL_DETECTORS)
+        self.detectors = get_detectors()
+        self.metrics = MetricsServer()
 
-    async def process_trade(self, trade):
-        # trade dict must contain: tx_hash, wallet, market_id, market_name, amount_usdc, timestamp
-        tx = trade.get('tx_hash') or trade.get('txHash')
-        wallet = trade.get('wallet')
-        market_id = trade.get('market_id') or trade.get('market', {}).get('id')
-        market_name = trade.get('market_name') or trade.get('market', {}).get('title')
-        amount = float(trade.get('amount_usdc') or trade.get('amount') or 0)
-        ts = int(trade.get('timestamp') or int(time.time()))
-
-        # Add trade to store
-        await self.store.add_trade(tx, wallet, market_id, market_name, amount, ts)
-
-        # Signal 2: large single trade
-        if amount >= self.threshold:
-            send_alert_email(wallet, amount, market_name, f'单笔金额≥{self.threshold} USDC')
-
-        # Signal 1: new wallet (first chain tx <24h) and no prior Polymarket trades
-        has_prior = await self.store.wallet_has_prior_polymarket_trades(wallet)
-        if not has_prior:
-            is_new = is_wallet_new(wallet)
-            if is_new:
-                send_alert_email(wallet, amount, market_name, '新钱包（链上首次交易<24h）')
-
-        # Signal 3: high-frequency same wallet same market >=3 in 24h
-        cnt = await self.store.count_wallet_market_recent(wallet, market_id)
-        if cnt >= 3:
-            send_alert_email(wallet, amount, market_name, f'24小时在同一市场交易≥3次（{cnt}次）')
+    async def _persist(self, batch):
+        """Stage 2a: buffer the batch for the store (committed by flush())."""
+        await self.store.add_trades([
+            (t.tx_hash, t.wallet, t.market_id, t.market_name, t.amount_usdc, t.timestamp)
+            for t in batch
+        ])
 
-    async def run_once(self):
-        trades = await self.adapter.fetch_recent_trades()
-        # Expect trades as list of dicts; deduplicate by tx_hash
+    def _observe(self, batch):
+        """Stage 2b: run the batch through the activity index.
+
+        Done strictly in batch order, so each trade sees exactly the trades
+        before it (per wallet and market) -- the frequency count and the
+        known-wallet check depend on that. Returns (trade, has_prior, count)
+        for trades not already processed in an earlier poll.
+        """
+        observed = []
+        for t in batch:
+            # Must be read before this trade is recorded, otherwise every wallet looks known
+            has_prior = self.activity.is_known_wallet(t.wallet)
+            if not self.activity.record(t.tx_hash, t.wallet, t.market_id, t.timestamp):
+                # Already processed this fill in an earlier poll
+                continue
+            observed.append((t, has_prior, self.activity.count_recent(t.wallet, t.market_id)))
+        TRADES.inc(len(batch) - len(observed), outcome='seen')
+        TRADES.inc(len(observed), outcome='new')
+        return observed
+
+    async def _enrich(self, observed):
+        """Stage 3: look up wallet age for first-seen wallets, concurrently."""
+        wallets = {t.wallet for t, has_prior, _cnt in observed if not has_prior and t.wallet}
+        sem = asyncio.Semaphore(settings.WALLET_AGE_CONCURRENCY)
+
+        async def lookup(wallet):
+            async with sem:
+                return wallet, await self.wallet_age.is_wallet_new(wallet)
+
+        return dict(await asyncio.gather(*(lookup(w) for w in wallets)))
+
+    def _evaluate(self, observed, new_wallets):
+        """Stage 4: apply the signal rules, then the batch detectors; returns alerts in order."""
+        fired = []
+        for t, has_prior, cnt in observed:
+            wallet, market_id, market_name, amount = t.wallet, t.market_id, t.market_name, t.amount_usdc
+
+            # Signal 2: large single trade
+            if amount >= self.threshold:
+                fired.append(('large_trade', wallet, market_id, amount, market_name, f'单笔金额≥{self.threshold} USDC'))
+
+            # Signal 1: new wallet (first chain tx <24h) and no prior Polymarket trades
+            if not has_prior and new_wallets.get(wallet):
+                fired.append(('new_wallet', wallet, market_id, amount, market_name, '新钱包（链上首次交易<24h）'))
+
+            # Signal 3: high-frequency same wallet same market >=3 in 24h
+            if cnt >= 3:
+                fired.append(('high_frequency', wallet, market_id, amount, market_name, f'24小时在同一市场交易≥3次（{cnt}次）'))
+        fired.extend(self._detect([t for t, _has_prior, _cnt in observed]))
+        return fired
+
+    def _detect(self, trades):
+        fired = []
+        for detector in self.detectors:
+            try:
+                fired.extend(detector.score(trades))
+            except Exception as e:
+                log.error('Error in signal detector %s: %s', detector.__class__.__name__, e)
+        return fired
+
+    async def _dispatch(self, fired):
+        """Stage 5: hand alerts to the dispatcher, subject to cooldowns."""
+        for signal, wallet, market_id, amount, market_name, reason in fired:
+            await self._alert(signal, wallet, market_id, amount, market_name, reason)
+
+    async def _alert(self, signal, wallet, market_id, amount, market_name, reason):
+        # Suppress repeats of the same (signal, wallet, market) inside the cooldown window
+        if await self.alert_state.should_fire(signal, wallet, market_id):
+            await self.alerts.enqueue(wallet, amount, market_name, reason)
+        else:
+            ALERTS.inc(outcome='suppressed')
+
+    async def process_batch(self, trades):
+        """Run `Trade` records, deduplicated by tx_hash, through persist -> observe -> enrich -> evaluate -> dispatch.
+        Adapters normalize once when mapping; nothing is re-probed here.
+        """
+        # Deduplicate by tx_hash
         seen = set()
+        batch = []
         for t in trades:
-            tx = t.get('tx_hash') or t.get('txHash')
-            if not tx or tx in seen:
+            if not t.tx_hash or t.tx_hash in seen:
                 continue
-            seen.add(tx)
-            await self.process_trade(t)
+            seen.add(t.tx_hash)
+            batch.append(t)
+        TRADES.inc(len(trades), outcome='fetched')
+        TRADES.inc(len(trades) - len(batch), outcome='duplicate')
+        if not batch:
+            return
+        with trace('persist', trades=len(batch)):
+            await self._persist(batch)
+        await self._analyze(batch)
 
-    async def run(self):
+    async def _analyze(self, batch):
+        """Stages 2b-5 for a persisted batch (ShardedMonitor hands these to worker processes)."""
+        with trace('observe', trades=len(batch)):
+            observed = self._observe(batch)
+        with trace('enrich', trades=len(observed)):
+            new_wallets = await self._enrich(observed)
+        with trace('evaluate', trades=len(observed)):
+            fired = self._evaluate(observed, new_wallets)
+        with trace('dispatch', alerts=len(fired)):
+            await self._dispatch(fired)
+
+    async def process_trade(self, trade):
+        # Accepts a hand-built dict too (e.g. scripts/demo_alerts.py)
+        if not isinstance(trade, Trade):
+            trade = Trade.from_dict(trade)
+        await self.process_batch([trade])
+
+    async def fetch(self):
+        """Yield (trades, cursors) chunks of up to POLY_PAGE_SIZE trades as they arrive.
+
+        `cursors` are the adapter's cursor moves covered by this chunk and the
+        ones before it; they travel with the chunk and are only saved once it
+        is persisted, so a chunk dropped on the way never has its trades
+        skipped on restart. The last chunk may carry cursors and no trades
+        (e.g. a page the market filter emptied).
+        """
+        chunk = []
+        async for trade in self.adapter.iter_trades():
+            chunk.append(trade)
+            if len(chunk) >= settings.POLY_PAGE_SIZE:
+                yield chunk, self.adapter.take_cursors()
+                chunk = []
+        cursors = self.adapter.take_cursors()
+        if chunk or cursors:
+            yield chunk, cursors
+
+    async def run_once(self):
+        try:
+            async for trades, cursors in self.fetch():
+                await self.process_chunk(trades, cursors)
+        finally:
+            self.end_poll()
+
+    async def _save_cursors(self, cursors):
+        for source, (timestamp, last_id) in (cursors or {}).items():
+            await self.store.set_cursor(source, timestamp, last_id)
+
+    async def process_chunk(self, trades, cursors=None):
+        try:
+            await self.process_batch(trades)
+            # After the trades: both land in the flush below
+            await self._save_cursors(cursors)
+        finally:
+            # Group-commit everything inserted during this chunk
+            with trace('flush'):
+                await self.store.flush()
+
+    def end_poll(self):
+        """Once per poll, after its last chunk: send due digests and prune in-memory state."""
+        with trace('end_poll'):
+            self.alerts.end_cycle()
+            self.activity.prune()
+            self.alert_state.prune()
+            for detector in self.detectors:
+                detector.prune()
+
+    async def process_fetched(self, trades, cursors=None):
+        try:
+            await self.process_chunk(trades, cursors)
+        finally:
+            self.end_poll()
+
+    async def start(self):
         await self.store.init()
-        while True:
+        await self.activity.warm_up(self.store)
+        await self.alert_state.load()
+        await self.alerts.start()
+        await self.adapter.start()
+        await self.maintenance.start()
+        await self.metrics.start()
+
+    async def close(self):
+        await self.metrics.close()
+        await self.maintenance.close()
+        await self.alerts.close()
+        await self.adapter.close()
+        await self.wallet_age.close()
+        await self.store.close()
+
+    async def _run_stream(self):
+        # Push mode: process each streamed batch as soon as it arrives
+        async for trades in self.adapter.stream():
             try:
-                await self.run_once()
+                await self.process_fetched(trades, self.adapter.take_cursors())
             except Exception as e:
-                print('Error in monitor loop', e)
-            await asyncio.sleep(self.poll_interval)
+                log.error('Error processing trades: %s', e)
+
+    async def run(self):
+        await self.start()
+        if self.adapter.streaming:
+            try:
+                await self._run_stream()
+            finally:
+                await self.close()
+            return
+        interval = AdaptiveInterval(
+            self.poll_interval,
+            settings.POLL_MIN_INTERVAL_SECONDS,
+            settings.POLL_MAX_INTERVAL_SECONDS,
+            settings.POLL_BUSY_TRADES,
+        )
+        scheduler = PollScheduler(
+            self.fetch,
+            self.process_chunk,
+            interval,
+            failed=lambda: bool(getattr(self.adapter, 'last_error', None)),
+            end_poll=self.end_poll,
+        )
+        try:
+            await scheduler.run()
+        finally:
+            await self.close()
@@ -0,0 +1,424 @@
+import asyncio
+import json
+import logging
+import time
+from .config import settings
+from .metrics import STORE_SECONDS, timed
+from .store import BaseStore, SECONDARY_INDEXES
+
+try:
+    import asyncpg
+except ImportError:  # optional: only needed with STORE_BACKEND=postgres
+    asyncpg = None
+
+log = logging.getLogger(__name__)
+
+# Ordered (version, script) pairs, tracked in schema_migrations. Mirrors the
+# SQLite schema at its current version; wallets and hourly rollups are
+# maintained by the flush statement instead of triggers.
+MIGRATIONS = [
+    (1, """
+CREATE TABLE IF NOT EXISTS trades (
+    id BIGSERIAL PRIMARY KEY,
+    tx_hash TEXT UNIQUE,
+    wallet TEXT,
+    market_id TEXT,
+    market_name TEXT,
+    amount_usdc DOUBLE PRECISION,
+    timestamp BIGINT
+);
+CREATE INDEX IF NOT EXISTS ix_trades_wallet_market_ts ON trades (wallet, market_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_trades_wallet ON trades (wallet);
+CREATE INDEX IF NOT EXISTS ix_trades_timestamp ON trades (timestamp);
+CREATE TABLE IF NOT EXISTS source_cursors (
+    source TEXT PRIMARY KEY,
+    timestamp BIGINT NOT NULL,
+    last_id TEXT
+);
+CREATE TABLE IF NOT EXISTS discovery_cache (
+    source TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    discovered_at BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wallet_first_tx (
+    wallet TEXT PRIMARY KEY,
+    first_tx_ts BIGINT,
+    checked_at BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    wallet TEXT,
+    amount_usdc DOUBLE PRECISION,
+    market_name TEXT,
+    reason TEXT,
+    created_at BIGINT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS alert_state (
+    signal TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    last_sent_at BIGINT NOT NULL,
+    PRIMARY KEY (signal, wallet, market_id)
+);
+CREATE TABLE IF NOT EXISTS wallets (
+    wallet TEXT PRIMARY KEY,
+    first_seen BIGINT NOT NULL,
+    last_seen BIGINT NOT NULL,
+    trade_count BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS market_hourly (
+    market_id TEXT NOT NULL,
+    hour BIGINT NOT NULL,
+    trade_count BIGINT NOT NULL,
+    volume_usdc DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (market_id, hour)
+);
+"""),
+    (2, """
+CREATE TABLE IF NOT EXISTS market_metadata (
+    market_id TEXT PRIMARY KEY,
+    title TEXT,
+    tags TEXT,
+    fetched_at BIGINT NOT NULL
+);
+"""),
+]
+
+# Any constant works; serializes migrations across instances starting together
+MIGRATION_LOCK_ID = 7307351
+
+TRADE_COLUMNS = ['tx_hash', 'wallet', 'market_id', 'market_name', 'amount_usdc', 'timestamp']
+
+# Per-session bulk-load table; emptied at the end of every flush transaction
+CREATE_STAGING = """
+CREATE TEMP TABLE IF NOT EXISTS trades_staging (
+    tx_hash TEXT, wallet TEXT, market_id TEXT, market_name TEXT, amount_usdc DOUBLE PRECISION, timestamp BIGINT
+) ON COMMIT DELETE ROWS
+"""
+
+# Staged rows -> trades, deduplicated on tx_hash; only rows actually inserted
+# update the wallet history and hourly rollups
+MERGE_STAGED = """
+WITH ins AS (
+    INSERT INTO trades (tx_hash, wallet, market_id, market_name, amount_usdc, timestamp)
+    SELECT tx_hash, wallet, market_id, market_name, amount_usdc, timestamp FROM trades_staging
+    ON CONFLICT (tx_hash) DO NOTHING
+    RETURNING wallet, market_id, amount_usdc, timestamp
+), w AS (
+    INSERT INTO wallets (wallet, first_seen, last_seen, trade_count)
+    SELECT wallet, MIN(timestamp), MAX(timestamp), COUNT(*) FROM ins WHERE wallet IS NOT NULL GROUP BY wallet
+    ON CONFLICT (wallet) DO UPDATE SET
+        first_seen = LEAST(wallets.first_seen, excluded.first_seen),
+        last_seen = GREATEST(wallets.last_seen, excluded.last_seen),
+        trade_count = wallets.trade_count + excluded.trade_count
+)
+INSERT INTO market_hourly (market_id, hour, trade_count, volume_usdc)
+SELECT market_id, timestamp / 3600 * 3600, COUNT(*), COALESCE(SUM(amount_usdc), 0) FROM ins
+WHERE market_id IS NOT NULL GROUP BY market_id, timestamp / 3600 * 3600
+ON CONFLICT (market_id, hour) DO UPDATE SET
+    trade_count = market_hourly.trade_count + excluded.trade_count,
+    volume_usdc = market_hourly.volume_usdc + excluded.volume_usdc
+"""
+
+UPSERT_CURSOR = """
+INSERT INTO source_cursors (source, timestamp, last_id) VALUES ($1, $2, $3)
+ON CONFLICT (source) DO UPDATE SET timestamp = excluded.timestamp, last_id = excluded.last_id
+"""
+
+
+def _rowcount(status):
+    # asyncpg returns the command tag, e.g. "DELETE 42"
+    try:
+        return int(status.split()[-1])
+    except (AttributeError, ValueError, IndexError):
+        return 0
+
+
+def _timed(op):
+    return timed(STORE_SECONDS, backend='postgres', op=op)
+
+
+class PostgresStore(BaseStore):
+    """PostgreSQL store on an asyncpg connection pool, for shared state across instances.
+
+    Trades are buffered like in SQLiteStore; `flush()` COPYs them into a
+    temporary staging table and merges them with one upsert statement, in
+    the same transaction as the cursor updates made since the last flush.
+    Everything else is written immediately (autocommit).
+    """
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._init_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self.initialized = False
+        self._pool = None
+        self._pending = []
+        self._pending_cursors = {}
+
+    async def init(self):
+        async with self._init_lock:
+            if self.initialized:
+                return
+            if asyncpg is None:
+                raise RuntimeError('STORE_BACKEND=postgres requires asyncpg (pip install asyncpg)')
+            if not self.dsn:
+                raise RuntimeError('STORE_BACKEND=postgres requires DATABASE_URL')
+            self._pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=settings.PG_POOL_MIN_SIZE,
+                max_size=settings.PG_POOL_MAX_SIZE,
+            )
+            await self._migrate()
+            self.initialized = True
+
+    async def _migrate(self):
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+                await conn.execute(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, applied_at BIGINT NOT NULL)"
+                )
+                current = await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+                for version, script in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    await conn.execute(script)
+                    await conn.execute(
+                        "INSERT INTO schema_migrations (version, applied_at) VALUES ($1, $2)",
+                        version, int(time.time())
+                    )
+                    log.info('Store schema migrated to version %d', version)
+
+    async def add_trades(self, rows):
+        await self.init()
+        self._pending.extend(
+            (r[0], r[1], r[2], r[3], float(r[4]) if r[4] is not None else None, int(r[5])) for r in rows
+        )
+
+    @_timed('flush')
+    async def flush(self):
+        if not self.initialized:
+            return
+        async with self._flush_lock:
+            rows, self._pending = self._pending, []
+            cursors, self._pending_cursors = self._pending_cursors, {}
+            if not rows and not cursors:
+                return
+            try:
+                async with self._pool.acquire() as conn:
+                    async with conn.transaction():
+                        if rows:
+                            await conn.execute(CREATE_STAGING)
+                            await conn.copy_records_to_table('trades_staging', records=rows, columns=TRADE_COLUMNS)
+                            await conn.execute(MERGE_STAGED)
+                        if cursors:
+                            await conn.executemany(
+                                UPSERT_CURSOR, [(k, ts, last_id) for k, (ts, last_id) in cursors.items()]
+                            )
+            except Exception:
+                # Keep the batch for the next flush; newer cursors win
+                self._pending = rows + self._pending
+                self._pending_cursors = {**cursors, **self._pending_cursors}
+                raise
+
+    async def close(self):
+        async with self._init_lock:
+            if not self.initialized:
+                return
+            try:
+                await self.flush()
+            finally:
+                await self._pool.close()
+                self._pool = None
+                self.initialized = False
+
+    async def drop_secondary_indexes(self):
+        """Kept in place: other instances read the shared database during a bulk load."""
+        await self.init()
+        await self.flush()
+
+    async def create_secondary_indexes(self):
+        """Build any missing read-side index without blocking writers, then refresh planner stats."""
+        await self.init()
+        await self.flush()
+        for _name, sql in SECONDARY_INDEXES:
+            # CONCURRENTLY can't run in a transaction block; pool.execute autocommits
+            await self._pool.execute(sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+        await self._pool.execute("ANALYZE trades")
+
+    @_timed('purge_trades')
+    async def purge_trades(self, before, chunk=5000):
+        await self.init()
+        await self.flush()
+        total = 0
+        while True:
+            deleted = _rowcount(await self._pool.execute(
+                "DELETE FROM trades WHERE id IN (SELECT id FROM trades WHERE timestamp<$1 LIMIT $2)",
+                int(before), chunk
+            ))
+            total += deleted
+            if deleted < chunk:
+                return total
+
+    async def purge_rollups(self, before):
+        await self.init()
+        return _rowcount(await self._pool.execute("DELETE FROM market_hourly WHERE hour<$1", int(before)))
+
+    @_timed('compact')
+    async def compact(self, pages=0):
+        # Plain VACUUM doesn't block writers; autovacuum does the rest
+        await self.init()
+        await self.flush()
+        for table in ('trades', 'market_hourly', 'wallets'):
+            await self._pool.execute(f"VACUUM (ANALYZE) {table}")
+
+    async def database_size(self):
+        await self.init()
+        size = await self._pool.fetchval("SELECT pg_database_size(current_database())")
+        # Reusable free space isn't cheaply known here
+        return size, 0
+
+    @_timed('count_wallet_market_recent')
+    async def count_wallet_market_recent(self, wallet, market_id, within_seconds=24*3600):
+        await self.init()
+        await self.flush()
+        cutoff = int(time.time()) - within_seconds
+        return await self._pool.fetchval(
+            "SELECT COUNT(*) FROM trades WHERE wallet=$1 AND market_id=$2 AND timestamp>=$3",
+            wallet, market_id, cutoff
+        )
+
+    @_timed('wallet_has_prior_polymarket_trades')
+    async def wallet_has_prior_polymarket_trades(self, wallet):
+        await self.init()
+        await self.flush()
+        return await self._pool.fetchval("SELECT 1 FROM wallets WHERE wallet=$1", wallet) is not None
+
+    @_timed('known_wallets')
+    async def known_wallets(self):
+        await self.init()
+        await self.flush()
+        return [r[0] for r in await self._pool.fetch("SELECT wallet FROM wallets")]
+
+    @_timed('recent_trades')
+    async def recent_trades(self, since):
+        await self.init()
+        await self.flush()
+        rows = await self._pool.fetch(
+            "SELECT tx_hash, wallet, market_id, timestamp FROM trades WHERE timestamp>=$1 ORDER BY timestamp",
+            int(since)
+        )
+        return [tuple(r) for r in rows]
+
+    @_timed('get_cursor')
+    async def get_cursor(self, source):
+        await self.init()
+        if source in self._pending_cursors:
+            return self._pending_cursors[source]
+        row = await self._pool.fetchrow("SELECT timestamp, last_id FROM source_cursors WHERE source=$1", source)
+        return (row[0], row[1]) if row else None
+
+    async def set_cursor(self, source, timestamp, last_id):
+        # Not written here: lands with the trades of the same batch on flush()
+        await self.init()
+        self._pending_cursors[source] = (int(timestamp), last_id)
+
+    async def get_discovery(self, source):
+        await self.init()
+        row = await self._pool.fetchrow("SELECT value, discovered_at FROM discovery_cache WHERE source=$1", source)
+        if not row:
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None
+
+    async def set_discovery(self, source, value, discovered_at):
+        await self.init()
+        await self._pool.execute(
+            "INSERT INTO discovery_cache (source, value, discovered_at) VALUES ($1, $2, $3) "
+            "ON CONFLICT (source) DO UPDATE SET value = excluded.value, discovered_at = excluded.discovered_at",
+            source, json.dumps(value), int(discovered_at)
+        )
+
+    async def clear_discovery(self, source):
+        await self.init()
+        await self._pool.execute("DELETE FROM discovery_cache WHERE source=$1", source)
+
+    @_timed('get_wallet_first_tx')
+    async def get_wallet_first_tx(self, wallet):
+        await self.init()
+        row = await self._pool.fetchrow("SELECT first_tx_ts, checked_at FROM wallet_first_tx WHERE wallet=$1", wallet)
+        return (row[0], row[1]) if row else None
+
+    @_timed('set_wallet_first_tx')
+    async def set_wallet_first_tx(self, wallet, first_tx_ts, checked_at):
+        await self.init()
+        await self._pool.execute(
+            "INSERT INTO wallet_first_tx (wallet, first_tx_ts, checked_at) VALUES ($1, $2, $3) "
+            "ON CONFLICT (wallet) DO UPDATE SET first_tx_ts = excluded.first_tx_ts, checked_at = excluded.checked_at",
+            wallet, first_tx_ts, int(checked_at)
+        )
+
+    @_timed('get_markets')
+    async def get_markets(self, market_ids):
+        await self.init()
+        rows = await self._pool.fetch(
+            "SELECT market_id, title, tags, fetched_at FROM market_metadata WHERE market_id = ANY($1::text[])",
+            list(market_ids)
+        )
+        return {r[0]: (r[1], tuple(json.loads(r[2] or '[]')), r[3]) for r in rows}
+
+    @_timed('set_markets')
+    async def set_markets(self, rows):
+        await self.init()
+        await self._pool.executemany(
+            "INSERT INTO market_metadata (market_id, title, tags, fetched_at) VALUES ($1, $2, $3, $4) "
+            "ON CONFLICT (market_id) DO UPDATE SET title = excluded.title, tags = excluded.tags, fetched_at = excluded.fetched_at",
+            [(m, title, json.dumps(list(tags or ())), int(ts)) for m, title, tags, ts in rows]
+        )
+
+    @_timed('add_alert')
+    async def add_alert(self, wallet, amount_usdc, market_name, reason, created_at):
+        await self.init()
+        return await self._pool.fetchval(
+            "INSERT INTO alert_outbox (wallet, amount_usdc, market_name, reason, created_at) "
+            "VALUES ($1, $2, $3, $4, $5) RETURNING id",
+            wallet, float(amount_usdc) if amount_usdc is not None else None, market_name, reason, int(created_at)
+        )
+
+    async def pending_alerts(self):
+        await self.init()
+        rows = await self._pool.fetch(
+            "SELECT id, wallet, amount_usdc, market_name, reason FROM alert_outbox ORDER BY id"
+        )
+        return [tuple(r) for r in rows]
+
+    @_timed('delete_alerts')
+    async def delete_alerts(self, alert_ids):
+        await self.init()
+        await self._pool.execute("DELETE FROM alert_outbox WHERE id = ANY($1::bigint[])", list(alert_ids))
+
+    async def bump_alert_attempts(self, alert_ids):
+        await self.init()
+        await self._pool.execute(
+            "UPDATE alert_outbox SET attempts = attempts + 1 WHERE id = ANY($1::bigint[])", list(alert_ids)
+        )
+
+    async def alert_states(self, since):
+        await self.init()
+        rows = await self._pool.fetch(
+            "SELECT signal, wallet, market_id, last_sent_at FROM alert_state WHERE last_sent_at>=$1",
+            int(since)
+        )
+        return [tuple(r) for r in rows]
+
+    @_timed('set_alert_state')
+    async def set_alert_state(self, signal, wallet, market_id, last_sent_at):
+        await self.init()
+        await self._pool.execute(
+            "INSERT INTO alert_state (signal, wallet, market_id, last_sent_at) VALUES ($1, $2, $3, $4) "
+            "ON CONFLICT (signal, wallet, market_id) DO UPDATE SET last_sent_at = excluded.last_sent_at",
+            signal, wallet, market_id, int(last_sent_at)
+        )
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from .config import settings
+from .metrics import POLL_SECONDS, POLLS, TRADES_PER_POLL
+
+log = logging.getLogger(__name__)
+
+
+class AdaptiveInterval:
+    """Poll interval that shortens under load and backs off when idle or failing.
+
+    - upstream error / rate limit: double, up to `max_s`
+    - at least `busy_trades` new trades: halve, down to `min_s`
+    - no new trades: grow by half, up to `max_s`
+    - otherwise: return to the configured base interval
+    """
+    def __init__(self, base, min_s, max_s, busy_trades):
+        self.base = float(base)
+        self.min_s = float(min(min_s, base))
+        self.max_s = float(max(max_s, base))
+        self.busy_trades = busy_trades
+        self.current = self.base
+
+    def update(self, new_trades, failed):
+        if failed:
+            self.current = min(max(self.current, self.base) * 2, self.max_s)
+        elif new_trades >= self.busy_trades:
+            self.current = max(min(self.current, self.base) / 2, self.min_s)
+        elif new_trades == 0:
+            self.current = min(max(self.current, self.base) * 1.5, self.max_s)
+        else:
+            self.current = self.base
+        return self.current
+
+
+class PollScheduler:
+    """Runs fetches on a fixed cadence, independent of how long processing takes.
+
+    Each tick starts `interval` seconds after the previous tick *started*.
+    `fetch()` returns an async iterator of (trades, cursors) chunks; each
+    goes to a bounded queue drained by a single processing task as soon as
+    it arrives, followed by an end-of-poll marker that triggers `end_poll()`.
+    Cursors travel with their chunk and are saved by `process(trades,
+    cursors)`, so chunks still queued at shutdown are fetched again later. A full queue
+    pauses the fetch mid-poll; if it is already full when a tick is due, the
+    tick is skipped -- adapters fetch from a cursor, so the next tick picks
+    the skipped trades up.
+    """
+    _END = None
+
+    def __init__(self, fetch, process, interval, queue_size=None, failed=None, drain_timeout=10, end_poll=None):
+        self.fetch = fetch
+        self.process = process
+        self.end_poll = end_poll or (lambda: None)
+        self.interval = interval
+        self.failed = failed or (lambda: False)
+        self.drain_timeout = drain_timeout
+        self.queue = asyncio.Queue(maxsize=queue_size or settings.PROCESS_QUEUE_SIZE)
+        self.skipped_ticks = 0
+
+    async def _process_loop(self):
+        while True:
+            chunk = await self.queue.get()
+            try:
+                if chunk is self._END:
+                    self.end_poll()
+                else:
+                    await self.process(*chunk)
+            except Exception as e:
+                log.error('Error processing trades: %s', e)
+            finally:
+                self.queue.task_done()
+
+    async def _tick(self):
+        if self.queue.full():
+            self.skipped_ticks += 1
+            log.warning('Processing queue full; skipping poll (%d skipped so far)', self.skipped_ticks)
+            POLLS.inc(outcome='skipped')
+            return None
+        count = 0
+        start = time.perf_counter()
+        try:
+            async for trades, cursors in self.fetch():
+                if trades or cursors:
+                    # Blocks while the processor is behind (backpressure)
+                    await self.queue.put((trades, cursors))
+                    count += len(trades)
+        except Exception as e:
+            log.error('Error fetching trades: %s', e)
+            POLLS.inc(outcome='error')
+            return self.interval.update(count, failed=True)
+        finally:
+            await self.queue.put(self._END)
+        POLL_SECONDS.observe(time.perf_counter() - start)
+        POLLS.inc(outcome='ok')
+        TRADES_PER_POLL.observe(count)
+        return self.interval.update(count, failed=self.failed())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        worker = asyncio.ensure_future(self._process_loop())
+        try:
+            while True:
+                tick_start = loop.time()
+                delay = await self._tick()
+                if delay is None:
+                    delay = self.interval.current
+                await asyncio.sleep(max(0.0, tick_start + delay - loop.time()))
+        finally:
+            # Let already-fetched chunks finish; the rest never save their cursors
+            try:
+                await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                log.warning('%d fetched chunk(s) not processed before shutdown; they will be fetched again', self.queue.qsize())
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
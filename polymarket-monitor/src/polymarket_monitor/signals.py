@@ -0,0 +1,212 @@
+import logging
+from .config import settings
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed when SIGNAL_DETECTORS enables a NumPy detector
+    np = None
+
+log = logging.getLogger(__name__)
+
+
+class Detector:
+    """A batch signal detector, run by Monitor after the fixed rules.
+
+    `score(trades)` gets the batch's newly observed `Trade` records in order
+    and returns fired (signal, wallet, market_id, amount_usdc, market_name,
+    reason) tuples; cooldowns and delivery are applied by Monitor.
+    """
+    def score(self, trades):
+        raise NotImplementedError
+
+    def prune(self, now=None):
+        """Called once per poll to bound in-memory state."""
+        pass
+
+
+class _Table:
+    """Dense float64 columns with one row per key, grown by doubling.
+
+    Keys map to row numbers once; every per-row update after that is a
+    vectorized array operation.
+    """
+    def __init__(self, columns, capacity=256):
+        self.rows = {}
+        self.keys = []
+        self.cols = {name: np.zeros(capacity) for name in columns}
+
+    def lookup(self, keys):
+        rows = self.rows
+        idx = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = len(self.keys)
+                self.keys.append(key)
+            idx[i] = row
+        capacity = len(next(iter(self.cols.values())))
+        if len(self.keys) > capacity:
+            capacity = max(len(self.keys), capacity * 2)
+            for name, col in self.cols.items():
+                grown = np.zeros(capacity)
+                grown[:len(col)] = col
+                self.cols[name] = grown
+        return idx
+
+    def keep(self, mask):
+        """Drop rows where `mask` is False and renumber the rest."""
+        kept = np.nonzero(mask)[0]
+        self.keys = [self.keys[i] for i in kept]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        for name, col in self.cols.items():
+            compact = np.zeros(max(len(col) // 2, len(kept), 256))
+            compact[:len(kept)] = col[kept]
+            self.cols[name] = compact
+
+
+class AnomalyScorer(Detector):
+    """Scores each batch in one vectorized pass against per-market baselines.
+
+    Per market it keeps an exponentially weighted mean/variance of log trade
+    size, trade counts decayed over a short (burst) and a long (baseline)
+    window, and decayed volume; per (wallet, market) the decayed volume.
+    Decay runs on trade timestamps, so backfills score like live traffic.
+
+    - size_anomaly: log size z-score against the market's prior state
+    - wallet_concentration: wallet's share of the market's recent volume
+    - market_burst: short-window trade rate over the market's baseline rate
+
+    Markets need ANOMALY_MIN_SAMPLES trades (and four burst windows of
+    history for bursts) before they can fire, so the scorer starts quiet.
+    """
+    MARKET_COLUMNS = ('n', 'mean', 'var', 'short', 'long', 'volume', 'first_ts', 'last_ts')
+    PAIR_COLUMNS = ('volume', 'last_ts')
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError('The anomaly detector requires numpy (pip install numpy)')
+        self.markets = _Table(self.MARKET_COLUMNS)
+        self.pairs = _Table(self.PAIR_COLUMNS)
+        self.alpha = settings.ANOMALY_EWMA_ALPHA
+        self.z_threshold = settings.ANOMALY_Z_THRESHOLD
+        self.min_samples = settings.ANOMALY_MIN_SAMPLES
+        self.short_window = float(settings.ANOMALY_BURST_WINDOW_SECONDS)
+        self.long_window = float(settings.ANOMALY_BASELINE_WINDOW_SECONDS)
+        self.burst_ratio = settings.ANOMALY_BURST_RATIO
+        self.burst_min_trades = settings.ANOMALY_BURST_MIN_TRADES
+        self.concentration_ratio = settings.ANOMALY_CONCENTRATION_RATIO
+        self.concentration_min_usdc = settings.ANOMALY_CONCENTRATION_MIN_USDC
+
+    def score(self, trades):
+        trades = [t for t in trades if t.market_id is not None]
+        if not trades:
+            return []
+        count = len(trades)
+        amounts = np.fromiter((t.amount_micro for t in trades), dtype=np.float64, count=count) / 1e6
+        ts = np.fromiter((t.timestamp for t in trades), dtype=np.float64, count=count)
+        m = self.markets.lookup([t.market_id for t in trades])
+        p = self.pairs.lookup([(t.wallet, t.market_id) for t in trades])
+        M, P = self.markets.cols, self.pairs.cols
+        x = np.log1p(np.maximum(amounts, 0))
+
+        # Size z-scores against each market's state before this batch
+        std = np.sqrt(M['var'][m])
+        ready = (M['n'][m] >= self.min_samples) & (std > 0)
+        z = np.where(ready, (x - M['mean'][m]) / np.where(std > 0, std, 1), 0.0)
+
+        # Fold the batch into the per-market EWMA (one step per market, weighted by its trade count)
+        touched, inv = np.unique(m, return_inverse=True)
+        k = np.bincount(inv).astype(np.float64)
+        batch_mean = np.bincount(inv, weights=x) / k
+        batch_var = np.bincount(inv, weights=(x - batch_mean[inv]) ** 2) / k
+        a = 1 - (1 - self.alpha) ** k
+        first = M['n'][touched] == 0
+        delta = batch_mean - M['mean'][touched]
+        # Spread between the old mean and the batch's, plus the spread within the batch
+        M['var'][touched] = np.where(first, batch_var, (1 - a) * (M['var'][touched] + a * delta ** 2) + a * batch_var)
+        M['mean'][touched] = np.where(first, batch_mean, M['mean'][touched] + a * delta)
+        M['n'][touched] += k
+
+        # Decayed counts and volume, per market and per (wallet, market)
+        t_max = np.full(len(touched), -np.inf)
+        np.maximum.at(t_max, inv, ts)
+        t_min = np.full(len(touched), np.inf)
+        np.minimum.at(t_min, inv, ts)
+        M['first_ts'][touched] = np.where(first, t_min, np.minimum(M['first_ts'][touched], t_min))
+        dt = np.maximum(t_max - M['last_ts'][touched], 0)
+        M['short'][touched] = M['short'][touched] * np.exp(-dt / self.short_window) + k
+        long_decay = np.exp(-dt / self.long_window)
+        M['long'][touched] = M['long'][touched] * long_decay + k
+        M['volume'][touched] = M['volume'][touched] * long_decay + np.bincount(inv, weights=amounts)
+        M['last_ts'][touched] = np.maximum(M['last_ts'][touched], t_max)
+
+        ptouched, pinv = np.unique(p, return_inverse=True)
+        pt_max = np.full(len(ptouched), -np.inf)
+        np.maximum.at(pt_max, pinv, ts)
+        pdt = np.maximum(pt_max - P['last_ts'][ptouched], 0)
+        P['volume'][ptouched] = P['volume'][ptouched] * np.exp(-pdt / self.long_window) + np.bincount(pinv, weights=amounts)
+        P['last_ts'][ptouched] = np.maximum(P['last_ts'][ptouched], pt_max)
+
+        market_volume = M['volume'][m]
+        share = P['volume'][p] / np.where(market_volume > 0, market_volume, 1)
+        concentrated = (share >= self.concentration_ratio) & (market_volume >= self.concentration_min_usdc) \
+            & (M['n'][m] >= self.min_samples)
+
+        # Baseline rate over the long window, or over the market's history while it is shorter
+        age = M['last_ts'][touched] - M['first_ts'][touched]
+        baseline = M['long'][touched] / np.clip(age, self.short_window, self.long_window)
+        ratio = (M['short'][touched] / self.short_window) / np.where(baseline > 0, baseline, np.inf)
+        bursting = (ratio >= self.burst_ratio) & (M['short'][touched] >= self.burst_min_trades) \
+            & (age >= 4 * self.short_window) & (M['n'][touched] - k >= self.min_samples)
+
+        fired = []
+        for i in np.nonzero(z >= self.z_threshold)[0]:
+            t = trades[i]
+            fired.append(('size_anomaly', t.wallet, t.market_id, t.amount_usdc, t.market_name,
+                          f'交易金额异常（相对该市场 z={z[i]:.1f}）'))
+        # One alert per (wallet, market) and per market: the batch's last trade for it
+        last_of_pair = {}
+        for i in np.nonzero(concentrated)[0]:
+            last_of_pair[p[i]] = i
+        for i in last_of_pair.values():
+            t = trades[i]
+            fired.append(('wallet_concentration', t.wallet, t.market_id, t.amount_usdc, t.market_name,
+                          f'钱包占该市场近期成交额 {share[i]:.0%}'))
+        if bursting.any():
+            last_of_market = {}
+            for i in range(count):
+                last_of_market[inv[i]] = i
+            for j in np.nonzero(bursting)[0]:
+                t = trades[last_of_market[j]]
+                fired.append(('market_burst', None, t.market_id, t.amount_usdc, t.market_name,
+                              f'市场交易频率激增（基线的 {ratio[j]:.1f} 倍）'))
+        return fired
+
+    def prune(self, now=None):
+        # Pairs idle for two baseline windows have decayed below ~14% of their volume
+        size = len(self.pairs.keys)
+        if not size:
+            return
+        latest = self.markets.cols['last_ts'][:len(self.markets.keys)].max(initial=0)
+        now = float(now) if now is not None else latest
+        idle = self.pairs.cols['last_ts'][:size] < now - 2 * self.long_window
+        if idle.any():
+            self.pairs.keep(~idle)
+
+
+DETECTORS = {
+    'anomaly': AnomalyScorer,
+}
+
+
+def get_detectors():
+    """Build the detectors named in SIGNAL_DETECTORS (comma-separated)."""
+    names = [n.strip().lower() for n in (settings.SIGNAL_DETECTORS or '').split(',') if n.strip()]
+    detectors = []
+    for name in dict.fromkeys(names):
+        cls = DETECTORS.get(name)
+        if cls is None:
+            log.warning('Skipping unknown signal detector %r', name)
+            continue
+        detectors.append(cls())
+    return detectors
@@ -1,6 +1,12 @@
 import aiosqlite
 import asyncio
+import json
+import logging
 from datetime import datetime, timedelta
+from .config import settings
+from .metrics import STORE_SECONDS, timed
+
+log = logging.getLogger(__name__)
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS trades (
@@ -14,47 +20,623 @@ CREATE TABLE IF NOT EXISTS trades (
 );
 """
 
-class Store:
+# Ordered (version, script) pairs. The applied version is tracked in
+# PRAGMA user_version, so existing databases are upgraded in place by init().
+MIGRATIONS = [
+    (1, SCHEMA),
+    (2, """
+-- Drop duplicate fills (keep the first copy) before enforcing uniqueness
+DELETE FROM trades WHERE tx_hash IS NOT NULL AND id NOT IN (
+    SELECT MIN(id) FROM trades WHERE tx_hash IS NOT NULL GROUP BY tx_hash
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_trades_tx_hash ON trades (tx_hash);
+CREATE INDEX IF NOT EXISTS ix_trades_wallet_market_ts ON trades (wallet, market_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_trades_wallet ON trades (wallet);
+"""),
+    (3, """
+-- Per-source high-water marks for incremental fetching
+CREATE TABLE IF NOT EXISTS source_cursors (
+    source TEXT PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    last_id TEXT
+);
+"""),
+    (4, """
+-- Adapter endpoint / query-shape discovery results (JSON), re-probed after a TTL
+CREATE TABLE IF NOT EXISTS discovery_cache (
+    source TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    discovered_at INTEGER NOT NULL
+);
+"""),
+    (5, """
+-- Etherscan first-tx lookups; first_tx_ts NULL means "no transactions" as of checked_at
+CREATE TABLE IF NOT EXISTS wallet_first_tx (
+    wallet TEXT PRIMARY KEY,
+    first_tx_ts INTEGER,
+    checked_at INTEGER NOT NULL
+);
+"""),
+    (6, """
+-- Alerts waiting for delivery; rows are deleted once the email is sent
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    wallet TEXT,
+    amount_usdc REAL,
+    market_name TEXT,
+    reason TEXT,
+    created_at INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+"""),
+    (7, """
+-- Last time each (signal, wallet, market) alert fired, for cooldowns
+CREATE TABLE IF NOT EXISTS alert_state (
+    signal TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    last_sent_at INTEGER NOT NULL,
+    PRIMARY KEY (signal, wallet, market_id)
+);
+"""),
+    (8, """
+-- Compact per-wallet history; outlives raw-trade retention ("has ever traded")
+CREATE TABLE IF NOT EXISTS wallets (
+    wallet TEXT PRIMARY KEY,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    trade_count INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO wallets (wallet, first_seen, last_seen, trade_count)
+    SELECT wallet, MIN(timestamp), MAX(timestamp), COUNT(*) FROM trades WHERE wallet IS NOT NULL GROUP BY wallet;
+-- Hourly per-market volume, kept far longer than raw trades
+CREATE TABLE IF NOT EXISTS market_hourly (
+    market_id TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    trade_count INTEGER NOT NULL,
+    volume_usdc REAL NOT NULL,
+    PRIMARY KEY (market_id, hour)
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO market_hourly (market_id, hour, trade_count, volume_usdc)
+    SELECT market_id, timestamp / 3600 * 3600, COUNT(*), SUM(amount_usdc) FROM trades
+    WHERE market_id IS NOT NULL GROUP BY market_id, timestamp / 3600;
+-- Maintained on insert; rows skipped by INSERT OR IGNORE don't fire, so counts stay exact
+CREATE TRIGGER IF NOT EXISTS trg_trades_wallets AFTER INSERT ON trades WHEN NEW.wallet IS NOT NULL BEGIN
+    INSERT INTO wallets (wallet, first_seen, last_seen, trade_count) VALUES (NEW.wallet, NEW.timestamp, NEW.timestamp, 1)
+    ON CONFLICT (wallet) DO UPDATE SET
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen),
+        trade_count = trade_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_trades_market_hourly AFTER INSERT ON trades WHEN NEW.market_id IS NOT NULL BEGIN
+    INSERT INTO market_hourly (market_id, hour, trade_count, volume_usdc)
+    VALUES (NEW.market_id, NEW.timestamp / 3600 * 3600, 1, COALESCE(NEW.amount_usdc, 0))
+    ON CONFLICT (market_id, hour) DO UPDATE SET
+        trade_count = trade_count + 1,
+        volume_usdc = volume_usdc + excluded.volume_usdc;
+END;
+-- Retention deletes and the activity warm-up scan by time
+CREATE INDEX IF NOT EXISTS ix_trades_timestamp ON trades (timestamp);
+"""),
+    (9, """
+-- Resolved market titles/tags (MarketResolver); title NULL = unknown to Gamma when fetched
+CREATE TABLE IF NOT EXISTS market_metadata (
+    market_id TEXT PRIMARY KEY,
+    title TEXT,
+    tags TEXT,
+    fetched_at INTEGER NOT NULL
+);
+"""),
+]
+
+# Read-side trade indexes (created by migration 2). Bulk loads drop and rebuild
+# them; the unique tx_hash index stays, since INSERT OR IGNORE dedups on it.
+SECONDARY_INDEXES = [
+    ('ix_trades_wallet_market_ts', 'CREATE INDEX IF NOT EXISTS ix_trades_wallet_market_ts ON trades (wallet, market_id, timestamp)'),
+    ('ix_trades_wallet', 'CREATE INDEX IF NOT EXISTS ix_trades_wallet ON trades (wallet)'),
+    ('ix_trades_timestamp', 'CREATE INDEX IF NOT EXISTS ix_trades_timestamp ON trades (timestamp)'),
+]
+
+INSERT_TRADE = "INSERT OR IGNORE INTO trades (tx_hash,wallet,market_id,market_name,amount_usdc,timestamp) VALUES (?,?,?,?,?,?)"
+
+class BaseStore:
+    """Storage interface used by Monitor, the adapters, alerting and maintenance.
+
+    Trade inserts are buffered and only durable after `flush()`, which commits
+    them together with any cursor updates made since the last flush. Trade
+    reads see buffered rows. Implementations: SQLiteStore (default) and
+    PostgresStore (pgstore.py), picked by `get_store()` from STORE_BACKEND.
+    """
+    async def init(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def flush(self):
+        """Write buffered trades (and pending cursors) as one transaction."""
+        raise NotImplementedError
+
+    async def add_trades(self, rows):
+        """Buffer (tx_hash, wallet, market_id, market_name, amount_usdc, timestamp)
+        rows; duplicates by tx_hash are ignored on write."""
+        raise NotImplementedError
+
+    async def add_trade(self, tx_hash, wallet, market_id, market_name, amount_usdc, timestamp):
+        await self.add_trades([(tx_hash, wallet, market_id, market_name, amount_usdc, timestamp)])
+
+    # Signal and warm-up reads
+    async def count_wallet_market_recent(self, wallet, market_id, within_seconds=24*3600):
+        raise NotImplementedError
+
+    async def wallet_has_prior_polymarket_trades(self, wallet):
+        raise NotImplementedError
+
+    async def known_wallets(self):
+        raise NotImplementedError
+
+    async def recent_trades(self, since):
+        raise NotImplementedError
+
+    # Adapter state
+    async def get_cursor(self, source):
+        raise NotImplementedError
+
+    async def set_cursor(self, source, timestamp, last_id):
+        raise NotImplementedError
+
+    async def get_discovery(self, source):
+        raise NotImplementedError
+
+    async def set_discovery(self, source, value, discovered_at):
+        raise NotImplementedError
+
+    async def clear_discovery(self, source):
+        raise NotImplementedError
+
+    # Wallet-age cache
+    async def get_wallet_first_tx(self, wallet):
+        raise NotImplementedError
+
+    async def set_wallet_first_tx(self, wallet, first_tx_ts, checked_at):
+        raise NotImplementedError
+
+    # Market metadata cache
+    async def get_markets(self, market_ids):
+        raise NotImplementedError
+
+    async def set_markets(self, rows):
+        raise NotImplementedError
+
+    # Alert outbox and cooldowns
+    async def add_alert(self, wallet, amount_usdc, market_name, reason, created_at):
+        raise NotImplementedError
+
+    async def pending_alerts(self):
+        raise NotImplementedError
+
+    async def delete_alerts(self, alert_ids):
+        raise NotImplementedError
+
+    async def bump_alert_attempts(self, alert_ids):
+        raise NotImplementedError
+
+    async def alert_states(self, since):
+        raise NotImplementedError
+
+    async def set_alert_state(self, signal, wallet, market_id, last_sent_at):
+        raise NotImplementedError
+
+    # Bulk load and maintenance
+    async def drop_secondary_indexes(self):
+        raise NotImplementedError
+
+    async def create_secondary_indexes(self):
+        raise NotImplementedError
+
+    async def purge_trades(self, before, chunk=5000):
+        raise NotImplementedError
+
+    async def purge_rollups(self, before):
+        raise NotImplementedError
+
+    async def incremental_vacuum_enabled(self):
+        """False if free pages can't be returned without a one-off conversion (SQLite only)."""
+        return True
+
+    async def enable_incremental_vacuum(self):
+        """Return True if the store had to be converted (SQLite only)."""
+        return False
+
+    async def compact(self, pages=0):
+        raise NotImplementedError
+
+    async def database_size(self):
+        raise NotImplementedError
+
+
+def _timed(op):
+    return timed(STORE_SECONDS, backend='sqlite', op=op)
+
+
+class SQLiteStore(BaseStore):
+    """SQLite trade store backed by a single long-lived connection.
+
+    Inserts are buffered and written with `executemany`; they only become
+    durable once `flush()` commits them (Monitor calls it once per poll batch).
+    Reads on the same connection always see buffered rows.
+    """
     def __init__(self, db_path):
         self.db_path = db_path
         self._init_lock = asyncio.Lock()
         self.initialized = False
+        self._db = None
+        self._pending = []
 
     async def init(self):
         async with self._init_lock:
             if self.initialized:
                 return
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.executescript(SCHEMA)
-                await db.commit()
+            self._db = await aiosqlite.connect(self.db_path)
+            await self._apply_pragmas()
+            await self._migrate()
             self.initialized = True
 
-    async def add_trade(self, tx_hash, wallet, market_id, market_name, amount_usdc, timestamp):
+    async def _apply_pragmas(self):
+        # Only takes effect on a new database; existing ones are converted offline
+        # by scripts/enable_incremental_vacuum.py
+        await self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL lets readers proceed during writes; NORMAL sync is safe under WAL
+        # and avoids an fsync per commit.
+        await self._db.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        await self._db.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        await self._db.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        await self._db.execute("PRAGMA temp_store=MEMORY")
+
+    async def _migrate(self):
+        cursor = await self._db.execute("PRAGMA user_version")
+        current = (await cursor.fetchone())[0]
+        await cursor.close()
+        for version, script in MIGRATIONS:
+            if version <= current:
+                continue
+            # executescript commits first, so each step lands atomically with its version bump
+            await self._db.executescript(f"BEGIN;\n{script}\nPRAGMA user_version={version};\nCOMMIT;")
+            log.info('Store schema migrated to version %d', version)
+
+    async def _write_pending(self):
+        # Push buffered rows into the open transaction without committing
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        await self._db.executemany(INSERT_TRADE, rows)
+
+    async def add_trades(self, rows):
+        """Buffer many (tx_hash, wallet, market_id, market_name, amount_usdc, timestamp) rows."""
+        await self.init()
+        self._pending.extend((r[0], r[1], r[2], r[3], r[4], int(r[5])) for r in rows)
+
+    @_timed('flush')
+    async def flush(self):
+        """Write buffered trades and commit them as one transaction."""
+        if not self.initialized:
+            return
+        await self._write_pending()
+        await self._db.commit()
+
+    async def close(self):
+        async with self._init_lock:
+            if not self.initialized:
+                return
+            try:
+                await self._write_pending()
+                await self._db.commit()
+            finally:
+                await self._db.close()
+                self._db = None
+                self.initialized = False
+
+    async def drop_secondary_indexes(self):
+        """Drop the read-side trade indexes ahead of a bulk load."""
         await self.init()
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT INTO trades (tx_hash,wallet,market_id,market_name,amount_usdc,timestamp) VALUES (?,?,?,?,?,?)",
-                (tx_hash, wallet, market_id, market_name, amount_usdc, int(timestamp))
+        await self.flush()
+        for name, _sql in SECONDARY_INDEXES:
+            await self._db.execute(f"DROP INDEX IF EXISTS {name}")
+        await self._db.commit()
+
+    async def create_secondary_indexes(self):
+        """Rebuild the read-side trade indexes (one sort per index) and refresh planner stats."""
+        await self.init()
+        await self.flush()
+        for _name, sql in SECONDARY_INDEXES:
+            await self._db.execute(sql)
+        await self._db.execute("ANALYZE trades")
+        await self._db.commit()
+
+    @_timed('purge_trades')
+    async def purge_trades(self, before, chunk=5000):
+        """Delete raw trades older than `before` in small committed chunks
+        (so the write lock is never held for long); returns the row count.
+        Wallet history and hourly rollups are unaffected.
+        """
+        await self.init()
+        await self.flush()
+        total = 0
+        while True:
+            cursor = await self._db.execute(
+                "DELETE FROM trades WHERE id IN (SELECT id FROM trades WHERE timestamp<? LIMIT ?)",
+                (int(before), chunk)
             )
-            await db.commit()
+            deleted = cursor.rowcount
+            await cursor.close()
+            await self._db.commit()
+            total += deleted
+            if deleted < chunk:
+                return total
+
+    async def purge_rollups(self, before):
+        await self.init()
+        cursor = await self._db.execute("DELETE FROM market_hourly WHERE hour<?", (int(before),))
+        deleted = cursor.rowcount
+        await cursor.close()
+        await self._db.commit()
+        return deleted
+
+    async def incremental_vacuum_enabled(self):
+        await self.init()
+        cursor = await self._db.execute("PRAGMA auto_vacuum")
+        mode = (await cursor.fetchone())[0]
+        await cursor.close()
+        return mode == 2
 
+    async def enable_incremental_vacuum(self):
+        """Switch an existing database to auto_vacuum=INCREMENTAL (one full VACUUM).
+
+        Rewrites the whole file and holds the only connection while doing
+        so: meant for scripts/enable_incremental_vacuum.py with the monitor
+        stopped, never for the live loop.
+        """
+        if await self.incremental_vacuum_enabled():
+            return False
+        # VACUUM fails inside a transaction: commit anything buffered first
+        await self.flush()
+        await self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await self._db.execute("VACUUM")
+        return True
+
+    @_timed('compact')
+    async def compact(self, pages=0):
+        """Return up to `pages` free pages to the OS (0: all) and refresh planner stats."""
+        await self.init()
+        await self.flush()
+        cursor = await self._db.execute(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+        # The pragma frees pages as it is stepped, so run it to completion
+        await cursor.fetchall()
+        await cursor.close()
+        # Bounded sampling keeps ANALYZE cheap on a large table
+        await self._db.execute("PRAGMA analysis_limit=1000")
+        await self._db.execute("ANALYZE")
+        await self._db.commit()
+
+    async def database_size(self):
+        """Return (page_count * page_size, freelist_count * page_size) in bytes."""
+        await self.init()
+        sizes = []
+        for pragma in ("page_count", "freelist_count"):
+            cursor = await self._db.execute(f"PRAGMA {pragma}")
+            sizes.append((await cursor.fetchone())[0])
+            await cursor.close()
+        cursor = await self._db.execute("PRAGMA page_size")
+        page_size = (await cursor.fetchone())[0]
+        await cursor.close()
+        return sizes[0] * page_size, sizes[1] * page_size
+
+    @_timed('count_wallet_market_recent')
     async def count_wallet_market_recent(self, wallet, market_id, within_seconds=24*3600):
         await self.init()
+        await self._write_pending()
         cutoff = int((datetime.utcnow() - timedelta(seconds=within_seconds)).timestamp())
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM trades WHERE wallet=? AND market_id=? AND timestamp>=?",
-                (wallet, market_id, cutoff)
-            )
-            row = await cursor.fetchone()
-            return row[0]
+        cursor = await self._db.execute(
+            "SELECT COUNT(*) FROM trades WHERE wallet=? AND market_id=? AND timestamp>=?",
+            (wallet, market_id, cutoff)
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        return row[0]
 
+    @_timed('wallet_has_prior_polymarket_trades')
     async def wallet_has_prior_polymarket_trades(self, wallet):
         await self.init()
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM trades WHERE wallet=?",
-                (wallet,)
+        await self._write_pending()
+        cursor = await self._db.execute(
+            "SELECT 1 FROM wallets WHERE wallet=?",
+            (wallet,)
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        return row is not None
+
+    @_timed('known_wallets')
+    async def known_wallets(self):
+        await self.init()
+        await self._write_pending()
+        # From the compact wallets table, so it survives raw-trade retention
+        cursor = await self._db.execute("SELECT wallet FROM wallets")
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return [r[0] for r in rows]
+
+    @_timed('recent_trades')
+    async def recent_trades(self, since):
+        """Return (tx_hash, wallet, market_id, timestamp) rows with timestamp >= since."""
+        await self.init()
+        await self._write_pending()
+        cursor = await self._db.execute(
+            "SELECT tx_hash, wallet, market_id, timestamp FROM trades WHERE timestamp>=? ORDER BY timestamp",
+            (int(since),)
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return rows
+
+    @_timed('get_cursor')
+    async def get_cursor(self, source):
+        """Return the (timestamp, last_id) high-water mark for a source, or None."""
+        await self.init()
+        cursor = await self._db.execute(
+            "SELECT timestamp, last_id FROM source_cursors WHERE source=?",
+            (source,)
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        return (row[0], row[1]) if row else None
+
+    async def set_cursor(self, source, timestamp, last_id):
+        # Not committed here: lands with the trades of the same batch on flush().
+        # Buffered trades go in first, so no other commit can take the cursor without them
+        await self.init()
+        await self._write_pending()
+        await self._db.execute(
+            "INSERT OR REPLACE INTO source_cursors (source, timestamp, last_id) VALUES (?,?,?)",
+            (source, int(timestamp), last_id)
+        )
+
+    async def get_discovery(self, source):
+        """Return (value, discovered_at) for a cached discovery result, or None."""
+        await self.init()
+        cursor = await self._db.execute(
+            "SELECT value, discovered_at FROM discovery_cache WHERE source=?",
+            (source,)
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        if not row:
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None
+
+    async def set_discovery(self, source, value, discovered_at):
+        await self.init()
+        await self._db.execute(
+            "INSERT OR REPLACE INTO discovery_cache (source, value, discovered_at) VALUES (?,?,?)",
+            (source, json.dumps(value), int(discovered_at))
+        )
+
+    async def clear_discovery(self, source):
+        await self.init()
+        await self._db.execute("DELETE FROM discovery_cache WHERE source=?", (source,))
+
+    @_timed('get_wallet_first_tx')
+    async def get_wallet_first_tx(self, wallet):
+        """Return (first_tx_ts, checked_at) for a wallet, or None if never looked up."""
+        await self.init()
+        cursor = await self._db.execute(
+            "SELECT first_tx_ts, checked_at FROM wallet_first_tx WHERE wallet=?",
+            (wallet,)
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        return (row[0], row[1]) if row else None
+
+    @_timed('set_wallet_first_tx')
+    async def set_wallet_first_tx(self, wallet, first_tx_ts, checked_at):
+        await self.init()
+        await self._db.execute(
+            "INSERT OR REPLACE INTO wallet_first_tx (wallet, first_tx_ts, checked_at) VALUES (?,?,?)",
+            (wallet, first_tx_ts, int(checked_at))
+        )
+
+    @_timed('get_markets')
+    async def get_markets(self, market_ids):
+        """Return {market_id: (title, tags, fetched_at)} for the cached ids."""
+        await self.init()
+        result = {}
+        market_ids = list(market_ids)
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(market_ids), 500):
+            chunk = market_ids[i:i + 500]
+            cursor = await self._db.execute(
+                f"SELECT market_id, title, tags, fetched_at FROM market_metadata WHERE market_id IN ({','.join('?' * len(chunk))})",
+                chunk
             )
-            row = await cursor.fetchone()
-            return row[0] > 0
+            for market_id, title, tags, fetched_at in await cursor.fetchall():
+                result[market_id] = (title, tuple(json.loads(tags or '[]')), fetched_at)
+            await cursor.close()
+        return result
+
+    @_timed('set_markets')
+    async def set_markets(self, rows):
+        """Upsert (market_id, title, tags, fetched_at) rows."""
+        await self.init()
+        await self._db.executemany(
+            "INSERT OR REPLACE INTO market_metadata (market_id, title, tags, fetched_at) VALUES (?,?,?,?)",
+            [(m, title, json.dumps(list(tags or ())), int(ts)) for m, title, tags, ts in rows]
+        )
+
+    @_timed('add_alert')
+    async def add_alert(self, wallet, amount_usdc, market_name, reason, created_at):
+        """Queue an alert in the outbox and return its id."""
+        await self.init()
+        cursor = await self._db.execute(
+            "INSERT INTO alert_outbox (wallet, amount_usdc, market_name, reason, created_at) VALUES (?,?,?,?,?)",
+            (wallet, amount_usdc, market_name, reason, int(created_at))
+        )
+        alert_id = cursor.lastrowid
+        await cursor.close()
+        # Commit right away so a crash before the batch flush can't lose the alert
+        await self.flush()
+        return alert_id
+
+    async def pending_alerts(self):
+        """Return (id, wallet, amount_usdc, market_name, reason) rows, oldest first."""
+        await self.init()
+        cursor = await self._db.execute(
+            "SELECT id, wallet, amount_usdc, market_name, reason FROM alert_outbox ORDER BY id"
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return rows
+
+    @_timed('delete_alerts')
+    async def delete_alerts(self, alert_ids):
+        await self.init()
+        await self._db.executemany("DELETE FROM alert_outbox WHERE id=?", [(i,) for i in alert_ids])
+        await self._db.commit()
+
+    async def bump_alert_attempts(self, alert_ids):
+        await self.init()
+        await self._db.executemany("UPDATE alert_outbox SET attempts=attempts+1 WHERE id=?", [(i,) for i in alert_ids])
+
+    async def alert_states(self, since):
+        """Return (signal, wallet, market_id, last_sent_at) rows fired at or after `since`."""
+        await self.init()
+        cursor = await self._db.execute(
+            "SELECT signal, wallet, market_id, last_sent_at FROM alert_state WHERE last_sent_at>=?",
+            (int(since),)
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return rows
+
+    @_timed('set_alert_state')
+    async def set_alert_state(self, signal, wallet, market_id, last_sent_at):
+        await self.init()
+        await self._db.execute(
+            "INSERT OR REPLACE INTO alert_state (signal, wallet, market_id, last_sent_at) VALUES (?,?,?,?)",
+            (signal, wallet, market_id, int(last_sent_at))
+        )
+
+
+# Kept for existing imports
+Store = SQLiteStore
+
+
+def get_store():
+    """Build the store selected by STORE_BACKEND (sqlite | postgres)."""
+    backend = (settings.STORE_BACKEND or 'sqlite').lower()
+    if backend in ('postgres', 'postgresql'):
+        from .pgstore import PostgresStore
+        return PostgresStore(settings.DATABASE_URL)
+    return SQLiteStore(settings.SQLITE_PATH)
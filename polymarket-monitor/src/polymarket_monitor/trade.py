@@ -0,0 +1,150 @@
+import sys
+import time
+from typing import NamedTuple
+
+# Candidate source paths per field, tried in order when a schema is first seen.
+# Dotted paths descend into nested objects (e.g. `market { id title }`).
+ALIASES = {
+    'tx_hash': ('txHash', 'tx_hash', 'id', 'txhash'),
+    'wallet': ('trader', 'wallet', 'actor', 'owner'),
+    'market_id': ('market.id', 'market_id', 'marketId', 'outcome.market.id', 'market'),
+    'market_name': ('market.title', 'market.name', 'market_name', 'outcome.market.title'),
+    'amount': ('amountUsd', 'amount_usdc', 'amount', 'value'),
+    'timestamp': ('createdAt', 'timestamp', 'time'),
+}
+
+USDC_DECIMALS = 1_000_000
+
+
+class Trade(NamedTuple):
+    """One normalized fill. Amounts are integer micro-USDC (6 decimals);
+    wallet and market strings are interned, since they repeat across a batch.
+    """
+    tx_hash: str
+    wallet: str
+    market_id: str
+    market_name: str
+    amount_micro: int
+    timestamp: int
+
+    @property
+    def amount_usdc(self):
+        return self.amount_micro / USDC_DECIMALS
+
+    @classmethod
+    def from_dict(cls, d):
+        """Build a Trade from a dict in any known shape (scripts, REST feeds)."""
+        return TradeMapper.discover([d])(d)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _getter(path):
+    keys = path.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda item: item.get(key)
+
+    def get(item):
+        for key in keys:
+            if not isinstance(item, dict):
+                return None
+            item = item.get(key)
+        return item
+    return get
+
+
+def _micro_from_usdc(raw):
+    try:
+        return round(float(raw or 0) * USDC_DECIMALS)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _micro_from_base_units(raw):
+    # Subgraph amounts are integer base units already (6 decimals for USDC)
+    try:
+        return int(raw or 0)
+    except (TypeError, ValueError):
+        return _micro_from_usdc(raw)
+
+
+class TradeMapper:
+    """Maps raw items of one schema to `Trade` with pre-resolved field getters.
+
+    Built once per schema -- when a query shape is discovered, or statically
+    for known entities -- so each item costs one lookup per field instead of
+    probing every alias. `tx_sep` trims suffixes such as subgraph `<tx>_<log>`
+    ids; `base_units` marks amounts that are already micro-USDC integers.
+    """
+    __slots__ = ('paths', '_tx', '_wallet', '_market_id', '_market_name', '_amount', '_ts', '_tx_sep', '_to_micro')
+
+    def __init__(self, paths, base_units=False, tx_sep=None):
+        self.paths = paths
+        none = lambda item: None
+        get = lambda field: _getter(paths[field]) if paths.get(field) else none
+        self._tx = get('tx_hash')
+        self._wallet = get('wallet')
+        self._market_id = get('market_id')
+        self._market_name = get('market_name')
+        self._amount = get('amount')
+        self._ts = get('timestamp')
+        self._tx_sep = tx_sep
+        self._to_micro = _micro_from_base_units if base_units else _micro_from_usdc
+
+    @classmethod
+    def discover(cls, samples, aliases=ALIASES, **kwargs):
+        """Pick, per field, the first alias that has a value in any sample item."""
+        paths = {}
+        for field, candidates in aliases.items():
+            for path in candidates:
+                getter = _getter(path)
+                value = next((v for v in (getter(s) for s in samples if isinstance(s, dict)) if v is not None), None)
+                # A nested object is not a usable scalar (e.g. `market` when it has an id)
+                if value is not None and not isinstance(value, (dict, list)):
+                    paths[field] = path
+                    break
+        return cls(paths, **kwargs)
+
+    # Single-field reads, for decisions (filtering, cursors) made before mapping an item
+    def tx_hash(self, item):
+        tx = self._tx(item)
+        if tx is not None:
+            tx = str(tx)
+            if self._tx_sep and self._tx_sep in tx:
+                tx = tx.split(self._tx_sep, 1)[0]
+        return tx
+
+    def timestamp(self, item):
+        try:
+            return int(self._ts(item))
+        except (TypeError, ValueError):
+            return int(time.time())
+
+    def market(self, item):
+        """(market_id, market_name) of a raw item."""
+        market_id = self._market_id(item)
+        return (str(market_id) if market_id is not None else None), self._market_name(item)
+
+    def __call__(self, item):
+        tx = self._tx(item)
+        if tx is not None:
+            tx = str(tx)
+            if self._tx_sep and self._tx_sep in tx:
+                tx = tx.split(self._tx_sep, 1)[0]
+        ts = self._ts(item)
+        try:
+            ts = int(ts)
+        except (TypeError, ValueError):
+            ts = int(time.time())
+        market_id = self._market_id(item)
+        return Trade(
+            tx,
+            _intern(self._wallet(item)),
+            _intern(str(market_id) if market_id is not None else None),
+            _intern(self._market_name(item)),
+            self._to_micro(self._amount(item)),
+            ts,
+        )
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+import aiohttp
+from .config import settings
+from .metrics import Gauge, UPSTREAM_RETRIES, UPSTREAM_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """No usable response from any endpoint (message carries the last failure)."""
+
+
+class EndpointState:
+    """Circuit breaker plus rolling latency / error stats for one endpoint URL.
+
+    The breaker opens after UPSTREAM_BREAKER_FAILURES consecutive failures
+    and stays open for a cooldown that doubles on every failed probe (up to
+    UPSTREAM_BREAKER_MAX_COOLDOWN_SECONDS); once it elapses a single probe is
+    let through (half-open) and its outcome closes or re-opens the breaker.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.latencies = deque(maxlen=settings.UPSTREAM_STATS_WINDOW)
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.last_ok = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.open_until == 0:
+            return 'closed'
+        return 'open' if time.monotonic() < self.open_until else 'half-open'
+
+    def available(self):
+        """True if a request could go out now (without claiming the half-open probe)."""
+        state = self.state
+        return state == 'closed' or (state == 'half-open' and not self._probing)
+
+    def acquire(self):
+        """Claim permission to send one request; False while the circuit is open."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        """Give back a claimed probe whose request was cancelled (e.g. a losing hedge)."""
+        self._probing = False
+
+    def record(self, latency, ok):
+        self.requests += 1
+        self.error_rate += settings.UPSTREAM_ERROR_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        self._probing = False
+        self.last_ok = ok
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            self.cooldown = 0.0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.open_until or self.consecutive_failures >= settings.UPSTREAM_BREAKER_FAILURES:
+            self.cooldown = min(settings.UPSTREAM_BREAKER_MAX_COOLDOWN_SECONDS,
+                                self.cooldown * 2 or settings.UPSTREAM_BREAKER_COOLDOWN_SECONDS)
+            if not self.open_until:
+                log.warning('Circuit opened for %s after %d failures', self.url, self.consecutive_failures, extra={'endpoint': self.url})
+            self.open_until = time.monotonic() + self.cooldown
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def cost(self):
+        """Expected seconds to a good answer: median latency inflated by the error rate."""
+        median = self.percentile(50)
+        if median is None:
+            median = settings.UPSTREAM_UNKNOWN_LATENCY_SECONDS
+        return median / max(0.05, 1.0 - self.error_rate)
+
+
+# Process-wide, keyed by URL: every client talking to a host sees the same health
+_endpoints = {}
+
+
+def endpoint_state(url):
+    state = _endpoints.get(url)
+    if state is None:
+        state = _endpoints[url] = EndpointState(url)
+    return state
+
+
+def endpoint_stats():
+    """Snapshot of every endpoint's health; exported by the gauges below."""
+    return {
+        url: {
+            'state': s.state,
+            'requests': s.requests,
+            'failures': s.failures,
+            'error_rate': s.error_rate,
+            'p50': s.percentile(50),
+            'p95': s.percentile(95),
+        }
+        for url, s in _endpoints.items()
+    }
+
+
+CIRCUIT_OPEN = Gauge('polymonitor_upstream_circuit_open', 'Whether an endpoint circuit is open (1) or closed (0)',
+                     ['endpoint'], collect=lambda: {(url,): int(s['state'] != 'closed') for url, s in endpoint_stats().items()})
+ERROR_RATE = Gauge('polymonitor_upstream_error_rate', 'Smoothed error rate per endpoint (UPSTREAM_ERROR_ALPHA)',
+                   ['endpoint'], collect=lambda: {(url,): s['error_rate'] for url, s in endpoint_stats().items()})
+LATENCY = Gauge('polymonitor_upstream_latency_seconds',
+                'p50 / p95 latency over the last UPSTREAM_STATS_WINDOW good responses per endpoint', ['endpoint', 'quantile'],
+                collect=lambda: {(url, q): s[key] for url, s in endpoint_stats().items()
+                                 for q, key in (('0.5', 'p50'), ('0.95', 'p95')) if s[key] is not None})
+
+
+class RetryBudget:
+    """Caps retries and hedges at UPSTREAM_RETRY_BUDGET_RATIO of requests.
+
+    Every request deposits `ratio` tokens and every extra attempt spends
+    one, with UPSTREAM_RETRY_BUDGET_MIN tokens of headroom, so a failing
+    upstream sees at most (1 + ratio) times the normal load instead of
+    UPSTREAM_MAX_ATTEMPTS times.
+    """
+    def __init__(self, ratio=None, reserve=None):
+        self.ratio = settings.UPSTREAM_RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.capacity = float(settings.UPSTREAM_RETRY_BUDGET_MIN if reserve is None else reserve)
+        self.tokens = self.capacity
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def _accept_json(status, payload):
+    return status < 400 and payload is not None
+
+
+class UpstreamClient:
+    """Requests to one upstream service, spread over its candidate endpoints.
+
+    `request()` tries the endpoints in order of expected cost (see
+    EndpointState.cost), skipping open circuits, and retries failures on the
+    next-best endpoint after a full-jitter exponential backoff, within
+    UPSTREAM_MAX_ATTEMPTS and the client's retry budget. With
+    UPSTREAM_HEDGE_PERCENTILE set, a request still pending after that
+    latency percentile of its endpoint is duplicated to the next-best one
+    and the first good answer wins. `race()` sends to every available
+    endpoint at once, for when none is known to work yet.
+
+    `accept(status, payload)` decides whether a response (JSON-decoded, or
+    None) is usable; anything else counts as a failure of that endpoint.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.budget = RetryBudget()
+
+    def rank(self, endpoints, prefer=None):
+        """Available endpoints, cheapest first; `prefer` wins ties (e.g. before any stats exist)."""
+        candidates = [e for e in dict.fromkeys(endpoints) if e and endpoint_state(e).available()]
+        return sorted(candidates, key=lambda e: (endpoint_state(e).cost(), e != prefer))
+
+    def known_good(self, endpoints):
+        """True if some endpoint answered its last request and its circuit is closed."""
+        return any(endpoint_state(e).last_ok and endpoint_state(e).state == 'closed' for e in endpoints if e)
+
+    def _backoff(self, attempt):
+        cap = min(settings.UPSTREAM_RETRY_MAX_SECONDS, settings.UPSTREAM_RETRY_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    async def _one(self, session, method, url, accept, timeout, throttle, kwargs):
+        """One attempt against one endpoint; returns (url, status, payload) or raises UpstreamError."""
+        state = endpoint_state(url)
+        if not state.acquire():
+            raise UpstreamError(f'{url}: circuit open')
+        try:
+            if throttle is not None:
+                await throttle()
+            start = time.monotonic()
+            try:
+                async with session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as resp:
+                    status = resp.status
+                    try:
+                        payload = await resp.json(content_type=None)
+                    except Exception:
+                        payload = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._record(state, time.monotonic() - start, False)
+                raise UpstreamError(f'{url}: {e.__class__.__name__}: {e}') from e
+        except asyncio.CancelledError:
+            state.release()
+            raise
+        ok = accept(status, payload)
+        self._record(state, time.monotonic() - start, ok)
+        if not ok:
+            detail = payload.get('errors') or payload.get('message') if isinstance(payload, dict) else None
+            raise UpstreamError(f'{url}: unusable response (HTTP {status}){f": {detail}" if detail else ""}')
+        return url, status, payload
+
+    def _record(self, state, latency, ok):
+        state.record(latency, ok)
+        UPSTREAM_SECONDS.observe(latency, upstream=self.name, endpoint=state.url, outcome='ok' if ok else 'error')
+
+    def _hedge_delay(self, url):
+        if not settings.UPSTREAM_HEDGE_PERCENTILE:
+            return None
+        state = endpoint_state(url)
+        if len(state.latencies) < settings.UPSTREAM_HEDGE_MIN_SAMPLES:
+            return None
+        return state.percentile(settings.UPSTREAM_HEDGE_PERCENTILE)
+
+    async def _hedged(self, session, method, primary, backup, accept, timeout, throttle, kwargs):
+        first = asyncio.ensure_future(self._one(session, method, primary, accept, timeout, throttle, kwargs))
+        delay = self._hedge_delay(primary) if backup else None
+        if delay is None:
+            return await first
+        try:
+            done, _pending = await asyncio.wait({first}, timeout=delay)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done or not self.budget.withdraw():
+            return await first
+        UPSTREAM_RETRIES.inc(upstream=self.name, kind='hedge')
+        second = asyncio.ensure_future(self._one(session, method, backup, accept, timeout, throttle, kwargs))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def request(self, session, method, endpoints, accept=_accept_json, timeout=10, prefer=None, throttle=None, **kwargs):
+        """Send one logical request; returns (endpoint, status, payload) or raises UpstreamError.
+        `throttle` is awaited before every attempt (e.g. a rate limiter's acquire).
+        """
+        self.budget.deposit()
+        tried = []
+        error = None
+        for attempt in range(max(1, settings.UPSTREAM_MAX_ATTEMPTS)):
+            ranked = self.rank(endpoints, prefer)
+            if not ranked:
+                error = error or UpstreamError(f'{self.name}: every endpoint circuit is open')
+                break
+            if attempt:
+                if not self.budget.withdraw():
+                    break
+                UPSTREAM_RETRIES.inc(upstream=self.name, kind='retry')
+                await asyncio.sleep(self._backoff(attempt))
+            # Retries move on to endpoints not tried yet, while there are any
+            fresh = [e for e in ranked if e not in tried] or ranked
+            primary = fresh[0]
+            backup = next((e for e in fresh[1:] + ranked if e != primary), None)
+            tried.append(primary)
+            try:
+                return await self._hedged(session, method, primary, backup, accept, timeout, throttle, kwargs)
+            except UpstreamError as e:
+                error = e
+        raise error or UpstreamError(f'{self.name}: retry budget exhausted')
+
+    async def race(self, session, method, endpoints, accept=_accept_json, timeout=10, **kwargs):
+        """Send to every available endpoint at once; the first usable answer wins."""
+        self.budget.deposit()
+        targets = self.rank(endpoints)
+        if not targets:
+            raise UpstreamError(f'{self.name}: every endpoint circuit is open')
+        tasks = [asyncio.ensure_future(self._one(session, method, e, accept, timeout, None, kwargs)) for e in targets]
+        error = None
+        try:
+            for fut in asyncio.as_completed(tasks):
+                try:
+                    return await fut
+                except UpstreamError as e:
+                    error = e
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise error
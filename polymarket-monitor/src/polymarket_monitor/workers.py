@@ -0,0 +1,273 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import queue
+import zlib
+from .activity import ActivityIndex
+from .blockchain import WalletAgeService
+from .config import settings
+from .logs import setup_logging
+from .monitor import Monitor
+from .store import get_store
+
+log = logging.getLogger(__name__)
+
+
+def shard_of(wallet, count):
+    """Stable wallet -> shard mapping (str hash() is salted per process)."""
+    return zlib.crc32((wallet or '').lower().encode()) % count
+
+
+class _ShardWalletAge(WalletAgeService):
+    """Wallet-age lookups whose cache writes are handed back to the ingester.
+
+    Workers only read the shared store. Their own writes would contend with
+    the ingester's write transaction on the SQLite file (left open across
+    network awaits until its next flush) and fail with "database is locked".
+    """
+    def __init__(self, store=None, rate_per_sec=None):
+        super().__init__(store, rate_per_sec)
+        self.writes = []
+
+    async def _save(self, wallet, ts, checked_at):
+        self.writes.append((wallet, ts, checked_at))
+
+    def take_writes(self):
+        writes, self.writes = self.writes, []
+        return writes
+
+
+class ShardWorker(Monitor):
+    """Signal evaluation for one wallet shard, run inside a worker process.
+
+    Holds the activity index and wallet-age lookups for the wallets hashed
+    to it, so per-wallet state never crosses processes. Trades arrive
+    already persisted; fired alerts are returned to the ingester, which
+    applies cooldowns and delivers them, together with the wallet-age cache
+    entries to store (workers never write to the store).
+    """
+    def __init__(self, index, count):
+        # No adapter, alerting or maintenance here: the ingester owns those
+        self.index = index
+        self.count = count
+        self.store = get_store()
+        self.activity = ActivityIndex()
+        self.wallet_age = _ShardWalletAge(self.store, rate_per_sec=settings.ETHERSCAN_RATE_LIMIT_PER_SEC / count)
+        self.threshold = settings.ALERT_USDC_THRESHOLD
+        # Market-level detectors need every wallet's trades: they run in the ingester
+        self.detectors = []
+        self._fired = []
+
+    async def start(self):
+        await self.store.init()
+        await self.activity.warm_up(self.store, keep=lambda w: shard_of(w, self.count) == self.index)
+
+    async def close(self):
+        await self.wallet_age.close()
+        await self.store.close()
+
+    async def _persist(self, batch):
+        # Already stored by the ingester
+        pass
+
+    async def _dispatch(self, fired):
+        self._fired.extend(fired)
+
+    async def handle(self, batch):
+        """Evaluate one batch; returns the fired (signal, wallet, market_id, amount, market_name, reason) tuples."""
+        self._fired = []
+        await self._analyze(batch)
+        self.activity.prune()
+        return self._fired
+
+
+async def _worker_loop(index, count, inbox, outbox):
+    worker = ShardWorker(index, count)
+    await worker.start()
+    outbox.put(('ready', index, None))
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, inbox.get)
+            if batch is None:
+                return
+            try:
+                fired = await worker.handle(batch)
+            except Exception as e:
+                log.error('Worker %d: error processing trades: %s', index, e)
+                fired = []
+            # Wallet-age lookups that succeeded are kept even if the batch failed
+            outbox.put(('done', index, (fired, worker.wallet_age.take_writes())))
+    finally:
+        await worker.close()
+
+
+def _worker_main(index, count, inbox, outbox):
+    # spawn starts with unconfigured logging
+    setup_logging()
+    try:
+        asyncio.run(_worker_loop(index, count, inbox, outbox))
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardedMonitor(Monitor):
+    """Monitor that fans signal evaluation out to worker processes.
+
+    This process stays the ingester: it fetches, deduplicates, persists and
+    group-commits as usual, then partitions each batch by a stable hash of
+    the wallet and hands each part to that shard's worker. Workers send
+    fired alerts back and this process dispatches them, so cooldowns and
+    digests stay in one place. Batch detectors (SIGNAL_DETECTORS) look at
+    whole markets, so they score here before the fan-out; without the
+    workers' activity index they see every fetched trade, and adapters'
+    cursors keep re-fetches rare. A full worker inbox blocks the ingester
+    (backpressure); per-wallet order is kept since a wallet always maps
+    to the same worker.
+    """
+    def __init__(self, workers):
+        super().__init__()
+        self.workers = workers
+        # spawn: workers must not inherit this process's event loop or connections
+        self._ctx = multiprocessing.get_context('spawn')
+        self._inboxes = [self._ctx.Queue(maxsize=settings.WORKER_QUEUE_SIZE) for _ in range(workers)]
+        self._outbox = self._ctx.Queue()
+        self._procs = []
+        self._reader = None
+        self._in_flight = 0
+        self._idle = None
+        self._owner = None
+
+    async def start(self):
+        await self.store.init()
+        # Workers warm up from the store, so make everything buffered so far visible
+        await self.store.flush()
+        loop = asyncio.get_running_loop()
+        for index, inbox in enumerate(self._inboxes):
+            proc = self._ctx.Process(
+                target=_worker_main, args=(index, self.workers, inbox, self._outbox),
+                name=f'polymonitor-worker-{index}', daemon=True,
+            )
+            proc.start()
+            self._procs.append(proc)
+        ready = 0
+        while ready < self.workers:
+            try:
+                kind, _index, _payload = await loop.run_in_executor(None, functools.partial(self._outbox.get, timeout=1))
+            except queue.Empty:
+                self._check_workers('during startup')
+                continue
+            ready += kind == 'ready'
+        log.info('%d worker processes ready', self.workers)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # Stopped by the result reader if a worker process dies
+        self._owner = asyncio.current_task()
+        self._reader = asyncio.ensure_future(self._read_results())
+        await self.alert_state.load()
+        await self.alerts.start()
+        await self.adapter.start()
+        await self.maintenance.start()
+        await self.metrics.start()
+
+    def _check_workers(self, when=''):
+        dead = [p.name for p in self._procs if not p.is_alive()]
+        if dead:
+            raise RuntimeError(f'Worker process(es) exited{" " + when if when else ""}: {", ".join(dead)}')
+
+    async def _put(self, index, part):
+        # Blocks (off the loop) while the worker is behind, but not on a dead one
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                return await loop.run_in_executor(None, functools.partial(self._inboxes[index].put, part, timeout=1))
+            except queue.Full:
+                self._check_workers()
+
+    async def _analyze(self, batch):
+        self._check_workers()
+        if self.detectors:
+            await self._dispatch(self._detect(batch))
+        parts = [[] for _ in range(self.workers)]
+        for t in batch:
+            parts[shard_of(t.wallet, self.workers)].append(t)
+        for index, part in enumerate(parts):
+            if not part:
+                continue
+            await self._put(index, part)
+            self._in_flight += 1
+            self._idle.clear()
+
+    async def _read_results(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                kind, index, payload = await loop.run_in_executor(None, functools.partial(self._outbox.get, timeout=1))
+            except queue.Empty:
+                try:
+                    self._check_workers()
+                except RuntimeError as e:
+                    # Its batches will never come back: stop instead of stalling the ingester
+                    log.error('%s; stopping the monitor', e)
+                    self._in_flight = 0
+                    self._idle.set()
+                    if self._owner is not None:
+                        self._owner.cancel()
+                    return
+                continue
+            if kind == 'stop':
+                return
+            if kind != 'done':
+                continue
+            fired, writes = payload
+            try:
+                # Committed by the next flush, like the ingester's own writes
+                for wallet, first_tx_ts, checked_at in writes:
+                    await self.store.set_wallet_first_tx(wallet, first_tx_ts, checked_at)
+                await self._dispatch(fired)
+            except Exception as e:
+                log.error('Error dispatching alerts from worker %d: %s', index, e)
+            self._in_flight -= 1
+            if self._in_flight <= 0:
+                self._in_flight = 0
+                self._idle.set()
+
+    def end_poll(self):
+        # Activity state lives in the workers, which prune it themselves
+        self.alerts.end_cycle()
+        self.alert_state.prune()
+        for detector in self.detectors:
+            detector.prune()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        if self._procs:
+            try:
+                await asyncio.wait_for(self._idle.wait(), settings.ALERT_DRAIN_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                log.warning('%d batch(es) still in worker processes at shutdown', self._in_flight)
+            for inbox, proc in zip(self._inboxes, self._procs):
+                if not proc.is_alive():
+                    continue
+                try:
+                    await loop.run_in_executor(None, functools.partial(inbox.put, None, timeout=10))
+                except queue.Full:
+                    pass
+            for proc in self._procs:
+                await loop.run_in_executor(None, proc.join, 10)
+                if proc.is_alive():
+                    proc.terminate()
+            self._procs = []
+        if self._reader is not None:
+            self._outbox.put(('stop', None, None))
+            await self._reader
+            self._reader = None
+        await super().close()
+
+
+def get_monitor():
+    """Single-process Monitor, or a ShardedMonitor when MONITOR_WORKERS > 1."""
+    if settings.MONITOR_WORKERS > 1:
+        return ShardedMonitor(settings.MONITOR_WORKERS)
+    return Monitor()